@@ -11,7 +11,7 @@ Step 6: 데이터 조회 (GET)
 from fastapi import FastAPI, Depends, HTTPException, status, Query, Path
 from fastapi import Annotated
 from pydantic import BaseModel, Field
-from sqlmodel import Session, select
+from sqlmodel import Session, select, func
 from database import create_db_and_tables, get_session
 from models import ItemTable, ItemCreate, ItemResponse
 
@@ -160,8 +160,9 @@ def get_items_count(session: Session = Depends(get_session)):
         dict: 항목 수 정보
     """
     # count()를 사용하여 개수 조회
-    statement = select(ItemTable)
-    count = len(session.exec(statement).all())
+    # select(ItemTable)을 모두 불러와서 len()으로 세면 모든 행을 객체로 만들어야 하기 때문에 db에서 COUNT(*)로 세고 숫자 하나만 받아옴
+    statement = select(func.count()).select_from(ItemTable)
+    count = session.exec(statement).one()
     
     return {"total_count": count}
 
@@ -0,0 +1,69 @@
+"""
+조회 API 부하 테스트, 동시 요청 수(concurrency)마다 정해진 시간 동안 같은 요청을 반복해서 보내고 처리량과 지연 시간을 출력함
+user-001(sync -> async 세션 전환), 이후 커넥션 풀 크기 조정처럼 같은 조건에서 전후를 비교하기 위해 사용
+
+실행 방법은 server/bench/README.md 참고
+    python server/bench/load.py --base-url http://127.0.0.1:8080 --path "/get/student?offset=500&limit=20" --concurrency 1 10 100
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+async def run(base_url : str, path : str, concurrency : int, duration : float, timeout : float):
+    latencies = []
+    ok = 0
+    errors = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        end = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal ok, errors
+            while time.perf_counter() < end:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    success = response.status_code < 500
+                except httpx.HTTPError: # 시간 초과, 연결 실패
+                    success = False
+                latencies.append(time.perf_counter() - started)
+                if success:
+                    ok += 1
+                else:
+                    errors += 1
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    latencies.sort()
+    percentile = lambda p : latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float("nan")
+    return {
+        "concurrency" : concurrency,
+        "ok_rps" : ok / duration,
+        "p50_ms" : percentile(0.50),
+        "p99_ms" : percentile(0.99),
+        "errors" : errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="조회 API 부하 테스트")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8080", help="fastapi 주소, nginx를 거치려면 http://127.0.0.1/main_server")
+    parser.add_argument("--path", default="/get/student?offset=500&limit=20", help="요청할 경로와 쿼리 문자열")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100], help="동시 요청 수, 여러 개를 주면 차례대로 실행")
+    parser.add_argument("--duration", type=float, default=5.0, help="동시 요청 수마다 요청을 보낼 시간(초)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="요청 하나의 제한 시간(초), 넘기면 오류로 셈")
+    args = parser.parse_args()
+
+    print(f"GET {args.base_url}{args.path}, {args.duration:g}s per run")
+    print(f"{'concurrency':>11}  {'ok rps':>8}  {'p50':>9}  {'p99':>9}  {'errors':>6}")
+    for concurrency in args.concurrency:
+        result = asyncio.run(run(args.base_url, args.path, concurrency, args.duration, args.timeout))
+        print(f"{result['concurrency']:>11}  {result['ok_rps']:>8.0f}  {result['p50_ms']:>7.1f}ms  {result['p99_ms']:>7.1f}ms  {result['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+조회 응답 직렬화 비용 비교(user-020), 같은 1000행 페이지로 행당 비용을 잼
+    - 불러오기 : orm 객체(select(StudentTable)) vs 행 tuple(select_columns로 칼럼만 조회)
+    - 직렬화 : response_model=list[StudentTable] 경로(fastapi의 serialize_response + JSONResponse), jsonable_encoder + JSONResponse
+              vs fieldsets.render_fields(행 tuple -> dict -> orjson)
+    - 페이지 전체 : GET /get/student?limit=N을 FAST_RESPONSE_PATH 끔/켬, 조회 결과 캐시 끔/hit으로 나눠서 잼
+각 항목은 --repeat번 실행한 것 중 가장 빠른 값, 행당 µs는 그 값을 행 수로 나눈 것
+
+실행 방법은 server/bench/README.md 참고, 서버와 같은 db 환경변수(POSTGRES_USER 등)가 필요함
+    python server/bench/serialize.py --rows 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("STATS_REFRESH_INTERVAL", "0")
+os.environ.setdefault("AUTOCOMPLETE_REFRESH", "0")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main")) # 서버 코드는 server/main을 기준으로 임포트함
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import cache
+import fieldsets
+import util
+from app import app
+from fieldsets import render_fields, select_columns
+from models import Student
+
+
+async def best_of(repeat : int, func):
+    """func()를 repeat번 실행해서 가장 짧은 시간(초)과 마지막 결과를 반환"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        if asyncio.iscoroutine(result):
+            result = await result
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def report(name : str, seconds : float, rows : int):
+    print(f"{name:<64}  {seconds * 1e6 / rows:>7.2f}µs/row  {seconds * 1e3:>7.2f}ms/page")
+
+
+async def per_row(rows : int, offset : int, repeat : int):
+    table = Student.StudentTable
+    fields = tuple(table.model_fields)
+
+    # 캐시 세션(ReadSession)이 아닌 기본 세션으로 매번 db에서 불러옴
+    async with AsyncSession(util.async_engine, expire_on_commit=False) as session:
+        async def load_orm():
+            session.expunge_all() # identity map에 남은 객체를 재사용하지 않도록 비움
+            return (await session.exec(select(table).order_by(table.student_id).offset(offset).limit(rows))).all()
+
+        async def load_rows():
+            statement = select(*select_columns(table, fields)).order_by(table.student_id).offset(offset).limit(rows)
+            return (await session.exec(statement)).all()
+
+        seconds, orms = await best_of(repeat, load_orm)
+        report("load ORM objects", seconds, rows)
+        seconds, tuples = await best_of(repeat, load_rows)
+        report("load row tuples (select_columns)", seconds, rows)
+
+    assert len(orms) == len(tuples) == rows, f"Students에 offset {offset} 이후로 {rows}행이 필요함"
+
+    field = create_model_field(name="Response", type_=list[table], mode="serialization") # 라우터가 response_model로 만드는 것과 같은 필드
+
+    async def response_model_path():
+        content = await serialize_response(field=field, response_content=orms, is_coroutine=True)
+        return JSONResponse(content).body
+
+    seconds, body = await best_of(repeat, response_model_path)
+    report("serialize, response_model (validate + serialize)", seconds, rows)
+    seconds, _ = await best_of(repeat, lambda : JSONResponse(jsonable_encoder(orms)).body)
+    report("serialize, jsonable_encoder", seconds, rows)
+    seconds, fast_body = await best_of(repeat, lambda : render_fields(tuples, table, fields).body)
+    report("serialize, render_fields (orjson)", seconds, rows)
+    print(f"{'':<64}  response bytes : {len(body)} vs {len(fast_body)}")
+
+
+async def per_page(rows : int, offset : int, repeat : int):
+    path = f"/get/student?offset={offset}&limit={rows}"
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for query_cache in (False, True):
+            for fast in (False, True):
+                fieldsets.FAST_RESPONSE_PATH = fast
+                cache.set_query_cache(cache.MemoryCache(cache.QUERY_CACHE_SIZE, 3600) if query_cache else None)
+                (await client.get(path)).raise_for_status() # 캐시를 채움
+                seconds, _ = await best_of(repeat, lambda : client.get(path))
+                report(f"GET {path}, cache {'hit' if query_cache else 'off'}, fast path {'on' if fast else 'off'}", seconds, rows)
+
+
+async def main(args):
+    print(f"{args.rows} rows, best of {args.repeat}")
+    async with app.router.lifespan_context(app):
+        await per_row(args.rows, args.offset, args.repeat)
+        await per_page(args.rows, args.offset, args.repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="조회 응답 직렬화 비용 비교")
+    parser.add_argument("--rows", type=int, default=1000, help="한 페이지의 행 수")
+    parser.add_argument("--offset", type=int, default=0, help="페이지 시작 위치")
+    parser.add_argument("--repeat", type=int, default=50, help="항목마다 반복할 횟수, 가장 빠른 값을 사용함")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,126 @@
+"""
+같은 조회 요청이 한꺼번에 몰릴 때(stampede) single-flight(singleflight.py)를 끄고 켠 결과를 비교함
+user-022에서 사용, 클라이언트 수만큼의 요청이 같은 주소를 계속 보내는 동안 처리량, p50/p99 지연 시간과 db로 보낸 쿼리 수를 출력함
+
+db 쿼리 수를 정확히 세기 위해 서버를 따로 띄우지 않고 앱을 프로세스 안에서(httpx.ASGITransport) 실행함
+    - db 쿼리 : async_engine에 before_cursor_execute 리스너를 걸어서 셈(selectinload 등 한 요청의 쿼리가 여러 개면 모두 셈)
+    - 조회 결과 캐시 hit/miss, single-flight leader/follower 수도 함께 출력함
+주기적으로 db를 읽는 작업(통계 view 갱신, 자동완성 인덱스 갱신)이 쿼리 수에 섞이지 않도록 끄고 실행함
+
+실행 방법은 server/bench/README.md 참고, 서버와 같은 db 환경변수(POSTGRES_USER 등)가 필요함
+    python server/bench/stampede.py --path "/get/student?sort=age&offset=1000&limit=100" --clients 100 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("STATS_REFRESH_INTERVAL", "0")
+os.environ.setdefault("AUTOCOMPLETE_REFRESH", "0")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main")) # 서버 코드는 server/main을 기준으로 임포트함
+
+import httpx
+from sqlalchemy import event
+
+import cache
+import singleflight
+import util
+from app import app
+from autocomplete import student_names
+
+
+class QueryCounter:
+    """primary, 복제본 엔진으로 보낸 쿼리 수"""
+
+    def __init__(self):
+        self.count = 0
+        self.engines = [engine.sync_engine for engine in (util.async_engine, *util.replica_engines)]
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self)
+
+
+async def run(client, path : str, clients : int, duration : float, single_flight : bool, query_cache : bool, invalidate_every : float):
+    singleflight.SINGLE_FLIGHT = single_flight
+    singleflight.single_flight = singleflight.SingleFlight() # 실행마다 통계를 새로 셈
+    cache.set_query_cache(cache.MemoryCache(cache.QUERY_CACHE_SIZE, cache.QUERY_CACHE_TTL) if query_cache else None)
+
+    latencies = []
+    errors = 0
+    end = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < end:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                errors += 1
+
+    # 다른 워커의 쓰기로 캐시가 계속 비워지는 상황을 흉내냄
+    async def writer():
+        while invalidate_every > 0 and time.perf_counter() < end:
+            await asyncio.sleep(invalidate_every)
+            cache.invalidate_tables("Students")
+
+    with QueryCounter() as queries:
+        started = time.perf_counter()
+        await asyncio.gather(writer(), *[worker() for _ in range(clients)])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    percentile = lambda p : latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float("nan")
+    flights = singleflight.single_flight.stats()
+    cache_stats = cache.get_cache_stats()
+    return {
+        "single_flight" : "on" if single_flight else "off",
+        "rps" : len(latencies) / elapsed,
+        "queries_per_s" : queries.count / elapsed,
+        "p50_ms" : percentile(0.50),
+        "p99_ms" : percentile(0.99),
+        "errors" : errors,
+        "followers" : flights["followers"],
+        "cache_misses" : cache_stats.get("misses", "-")
+    }
+
+
+async def main(args):
+    async with app.router.lifespan_context(app):
+        while not student_names.ready: # 자동완성 인덱스를 불러오는 쿼리가 측정에 섞이지 않도록 기다림
+            await asyncio.sleep(0.1)
+
+        limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout, limits=limits) as client:
+            response = await client.get(args.path)
+            response.raise_for_status()
+
+            print(f"GET {args.path}, {args.clients} clients, {args.duration:g}s per run, "
+                  f"query cache {args.query_cache}, invalidate every {args.invalidate_every:g}s")
+            print(f"{'single-flight':>13}  {'req/s':>7}  {'db q/s':>7}  {'p50':>9}  {'p99':>9}  {'errors':>6}  {'followers':>9}  {'cache misses':>12}")
+            for single_flight in args.single_flight:
+                result = await run(client, args.path, args.clients, args.duration, single_flight == 1, args.query_cache == "on", args.invalidate_every)
+                print(f"{result['single_flight']:>13}  {result['rps']:>7.0f}  {result['queries_per_s']:>7.0f}  {result['p50_ms']:>7.1f}ms  {result['p99_ms']:>7.1f}ms  "
+                      f"{result['errors']:>6}  {result['followers']:>9}  {result['cache_misses']:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="같은 조회 요청이 몰릴 때 single-flight 전후 비교")
+    parser.add_argument("--path", default="/get/student?sort=age&offset=1000&limit=100", help="모든 클라이언트가 보낼 경로와 쿼리 문자열")
+    parser.add_argument("--clients", type=int, default=100, help="동시에 요청을 보내는 클라이언트 수")
+    parser.add_argument("--duration", type=float, default=10.0, help="실행마다 요청을 보낼 시간(초)")
+    parser.add_argument("--single-flight", type=int, nargs="+", choices=[0, 1], default=[0, 1], help="0은 끄고 1은 켜서 실행, 여러 개를 주면 차례대로 실행")
+    parser.add_argument("--query-cache", choices=["on", "off"], default="off", help="조회 결과 캐시 사용 여부, off면 캐시가 비어 있는 순간만 계속 재현됨")
+    parser.add_argument("--invalidate-every", type=float, default=0.0, help="이 시간(초)마다 Students 캐시를 지움, 0이면 지우지 않음")
+    parser.add_argument("--timeout", type=float, default=30.0, help="요청 하나의 제한 시간(초)")
+    asyncio.run(main(parser.parse_args()))
@@ -1,16 +1,30 @@
 from pydantic import BaseModel, Field
-from typing import Annotated
+from typing import Annotated, Literal
+from datetime import datetime
 
 from fastapi import APIRouter
 from fastapi import Path, Query
 from fastapi import HTTPException, status
-from fastapi import Depends
+from fastapi import Depends, Request, Response
+from fastapi.responses import StreamingResponse
 
-from sqlmodel import Session
 from sqlmodel import select
+from sqlalchemy.orm import selectinload
 
-from util import get_session
-from models import Student, College
+from util import ReadSession, get_read_session, pick_read_engine, async_engine
+from http_cache import cache_headers
+from college_replica import colleges
+from models import Student, College, Import
+import queries
+from pagination import MAX_PAGE_SIZE, decode_cursor, set_next_cursor
+from fieldsets import parse_fields, default_fields, select_columns, render_fields, render_models, field_schema, field_values
+from batch import parse_ids, order_by_ids, render_batch
+from etags import row_versions, make_etag, check_etag
+from export import EXPORT_WRITERS, EXPORT_MEDIA_TYPES, EXPORT_HEADERS
+from counting import with_exact_count, split_exact_count, estimate_count, set_total_count
+from search import SEARCH_MAX_LENGTH, normalize_query, search_statement, escape_like
+from autocomplete import student_names, MAX_AUTOCOMPLETE
+from importer import get_progress
 
 
 
@@ -18,35 +32,156 @@ from models import Student, College
 router = APIRouter(
     prefix="/get",
     tags=["Get Api"], # api 문서 자동화시 사용할 tag, 각 api가 어느 라우터에 해당하는지 알 수 있음
-    responses={404 : {"description" : "Not Found"}} # 라우터로 요청을 넘기고 404코드가 반환될 때 클라이언트로 전달할 데이터를 설정
+    responses={404 : {"description" : "Not Found"}}, # 라우터로 요청을 넘기고 404코드가 반환될 때 클라이언트로 전달할 데이터를 설정
+    dependencies=[Depends(cache_headers)] # 모든 응답에 nginx 마이크로 캐시용 Cache-Control, Surrogate-Key 헤더를 설정(http_cache.py 참고)
 )
 
 
 
+# include로 관계 데이터를 함께 요청하면 selectinload로 페이지 전체의 관계 데이터를 IN 쿼리 한 번에 가져옴
+# 관계 속성에 그냥 접근하면 행마다 쿼리가 한 번씩 나가기 때문(N+1 문제)
+# 관계 데이터는 orm 객체 전체가 필요하기 때문에 fields와는 함께 사용할 수 없음
+def check_include(fields, include):
+    if fields and include:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="fields와 include는 함께 사용할 수 없습니다")
+
+
+# 전체 개수는 목록 조회에만 의미가 있기 때문에 ids 일괄 조회와는 함께 사용할 수 없음
+def check_count(ids, count):
+    if ids and count != "none":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="count는 ids와 함께 사용할 수 없습니다")
+
+
+# 이름 검색(search.py), 점수 순으로 정렬되기 때문에 커서 대신 offset으로 페이지를 넘김
+class Query_search(BaseModel):
+    q : str = Field(min_length=1, max_length=SEARCH_MAX_LENGTH, description="검색어, 부분 문자열 또는 비슷한 이름을 찾음")
+    offset : int = Field(default=0, ge=0, description="조회를 시작할 첫 위치")
+    limit : int = Field(default=10, ge=1, le=MAX_PAGE_SIZE, description="조회 범위")
+
+
+async def run_search(q : Query_search, table, column, pk, pk_attr, request, response, session):
+    sql_query = search_statement(table, column, pk, normalize_query(q.q), q.offset, q.limit)
+    results = (await session.exec(sql_query)).all()
+    if not len(results):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="검색된 데이터가 없습니다")
+
+    not_modified = check_etag(request, response, make_etag(request, row_versions(results, pk_attr)))
+    if not_modified is not None:
+        return not_modified
+    return results
+
+
+def colleges_with_students(colleges):
+    return [College.CollegeReadWithStudents.model_validate(college) for college in colleges]
+
+
+def students_with_college(students):
+    # 관계 속성 이름이 collge이기 때문에 응답의 college 필드로 옮겨 담음
+    return [Student.StudentReadWithCollege.model_validate(student, update={"college" : student.collge}) for student in students]
+
+
+# ids 일괄 조회 결과를 요청한 id 순서대로 items에, 조회되지 않은 id는 missing에 담아서 반환
+# fields, include를 함께 요청하면 items의 모양도 그에 맞춰 줄이거나 늘림
+def render_ids(results, ids, model, pk_attr, fields, include_model=None, to_include=None, response=None):
+    items, missing = order_by_ids(results, ids, pk_attr)
+    if fields:
+        return render_batch([field_values(item, fields) for item in items], missing, field_schema(model, fields), response)
+    if include_model:
+        return render_batch(to_include(items), missing, include_model, response)
+    return render_batch(items, missing, model, response)
+
+
+
 # COLLEGE ------------------------------------------------------------------------------------------------------------------------------------------------------------
+# 소속 학생까지 함께 조회하는 경우(include=students)가 아니라면 db 대신 워커 메모리의 Colleges 사본(college_replica.py)에서 조회함
+# 사본이 준비되지 않은 경우(LISTEN 연결이 끊겨서 다시 불러오는 중 등)에는 db에서 조회함
 
 class Query_get_college(BaseModel):
-    offset : int | None = Field(default=0, ge=0, description="조회를 시작할 첫 위치")
-    limit : int | None = Field(default=10, ge=1, description="조회 범위")
+    offset : int | None = Field(default=0, ge=0, description="조회를 시작할 첫 위치, cursor가 있으면 무시됨")
+    limit : int | None = Field(default=10, ge=1, le=MAX_PAGE_SIZE, description="조회 범위")
+    cursor : str | None = Field(default=None, description="이전 응답의 X-Next-Cursor 헤더 값, 해당 페이지의 다음부터 조회")
+    ids : str | None = Field(default=None, description="조회할 college_id를 콤마로 구분, 예) 3,1,2, 있으면 offset, limit은 무시되고 {items, missing}을 반환")
+    fields : str | None = Field(default=None, description="응답에 포함할 필드를 콤마로 구분, 예) college_id,college_name")
+    include : Literal["students"] | None = Field(default=None, description="students를 주면 각 단과대학에 소속된 학생 목록을 함께 반환")
+    count : Literal["exact", "estimated", "none"] = Field(default="none", description="전체 개수를 X-Total-Count 헤더로 반환, exact는 정확한 개수, estimated는 db 통계로 추정한 개수")
 
 
-@router.get('/college', response_model=list[College.CollegeTable], description="단과대 정보 조회 API")
-def get_college_by_range(
+@router.get('/college', response_model=list[College.CollegeTable], description="단과대 정보 조회 API, 다음 페이지가 있으면 X-Next-Cursor 헤더로 커서를 반환, ids로 여러 단과대를 한 번에 조회 가능")
+async def get_college_by_range(
     q : Annotated[Query_get_college, Query(description="범위 조회를 위한 쿼리입니다")],
-    session : Session = Depends(get_session)
+    request : Request,
+    response : Response,
+    session : ReadSession = Depends(get_read_session, scope="function")
 ):
     
     try:
-        sql_query = (
-            select(College.CollegeTable)
-            .offset(q.offset)
-            .limit(q.limit)
-        )
-        
-        results = session.exec(sql_query).all()
-        if not len(results): # 조회된 결과가 없는 경우
+        fields = parse_fields(q.fields, College.CollegeTable)
+        check_include(fields, q.include)
+        fields = default_fields(College.CollegeTable, fields, q.include)
+        ids = parse_ids(q.ids)
+        check_count(ids, q.count)
+        if ids and q.cursor:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids와 cursor는 함께 사용할 수 없습니다")
+
+        after = decode_cursor(q.cursor, "college_id")[1] if q.cursor else None
+
+        total = None
+        if colleges.ready and not q.include:
+            if ids:
+                results = [colleges.get(college_id) for college_id in ids if colleges.get(college_id) is not None]
+            else:
+                results = colleges.page(q.offset, q.limit, after)
+            if q.count != "none": # 메모리에 전체가 있기 때문에 항상 정확한 개수
+                total, count_type = len(colleges.by_id), "exact"
+        else:
+            if ids:
+                sql_query, params = queries.COLLEGE_BY_IDS, {"ids" : list(ids)}
+            elif after is not None:
+                sql_query, params = queries.COLLEGE_AFTER, {"after" : after, "limit" : q.limit}
+            else:
+                sql_query, params = queries.COLLEGE_RANGE, {"offset" : q.offset, "limit" : q.limit}
+
+            if q.include:
+                sql_query = sql_query.options(selectinload(College.CollegeTable.students))
+
+            if fields: # 요청한 칼럼 + 커서를 만들기 위한 기본키 + ETag를 만들기 위한 버전만 조회
+                sql_query = sql_query.with_only_columns(*select_columns(College.CollegeTable, fields, "college_id", "version"))
+
+            if q.count == "exact":
+                sql_query = with_exact_count(sql_query, College.CollegeTable, [])
+                results, total = split_exact_count((await session.execute(sql_query, params)).all(), entity=not fields)
+            elif fields:
+                results = (await session.execute(sql_query, params)).all()
+            else:
+                results = (await session.exec(sql_query, params=params)).all()
+
+            if q.count == "estimated":
+                total = await estimate_count(session, College.CollegeTable, [])
+            count_type = q.count
+
+        if not ids and not len(results): # 조회된 결과가 없는 경우
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="조회된 데이터가 없습니다")
 
+        if not ids:
+            set_next_cursor(response, results, q.limit, "college_id", "college_id", "college_id")
+        if total is not None:
+            set_total_count(response, total, count_type)
+
+        # 클라이언트가 가진 페이지와 같다면 직렬화하지 않고 304를 반환, 전체 개수가 바뀌어도 다른 응답으로 봄
+        versions = row_versions(results, "college_id", "students" if q.include else None, "student_id")
+        not_modified = check_etag(request, response, make_etag(request, (versions, total)))
+        if not_modified is not None:
+            return not_modified
+
+        if ids:
+            return render_ids(
+                results, ids, College.CollegeTable, "college_id", fields, 
+                College.CollegeReadWithStudents if q.include else None, colleges_with_students, response
+            )
+        if fields:
+            return render_fields(results, College.CollegeTable, fields, response)
+        if q.include:
+            return render_models(colleges_with_students(results), College.CollegeReadWithStudents, response)
         return results
 
     except HTTPException:
@@ -59,23 +194,66 @@ def get_college_by_range(
         )
 
 
+# /college/{college_id}보다 먼저 선언해야 search가 college_id로 해석되지 않음
+@router.get('/college/search', response_model=list[College.CollegeTable], description="단과대 이름 검색 API, 부분 문자열 또는 비슷한 이름을 유사도 순으로 반환")
+async def search_college(
+    q : Annotated[Query_search, Query(description="검색을 위한 쿼리입니다")],
+    request : Request,
+    response : Response,
+    session : ReadSession = Depends(get_read_session, scope="function")
+):
+    try:
+        table = College.CollegeTable
+        return await run_search(q, table, table.college_name, table.college_id, "college_id", request, response, session)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f">>>>> Error Messege <<<<< \n {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="단과대학을 검색하는 도중 오류가 발생했습니다"
+        )
+
+
 @router.get('/college/{college_id}', response_model=College.CollegeTable)
-def get_college_by_collge_id(
+async def get_college_by_collge_id(
     college_id : Annotated[int, Path(description="특정 단과대 정보를 조회하는 경우 사용되는 정수")],
-    session : Session = Depends(get_session)
+    request : Request,
+    response : Response,
+    fields : Annotated[str | None, Query(description="응답에 포함할 필드를 콤마로 구분, 예) college_id,college_name")] = None,
+    include : Annotated[Literal["students"] | None, Query(description="students를 주면 소속된 학생 목록을 함께 반환")] = None,
+    session : ReadSession = Depends(get_read_session, scope="function")
 ):
     
     try:
-        sql_query = (
-            select(College.CollegeTable)
-            .where(College.CollegeTable.college_id == college_id)
-        )    
-        
-        result = session.exec(sql_query).one_or_none()
+        fields = parse_fields(fields, College.CollegeTable)
+        check_include(fields, include)
+        fields = default_fields(College.CollegeTable, fields, include)
+        params = {"college_id" : college_id}
+
+        if colleges.ready and not include:
+            result = colleges.get(college_id)
+        elif fields:
+            sql_query = queries.COLLEGE_BY_ID.with_only_columns(*select_columns(College.CollegeTable, fields, "college_id", "version"))
+            result = (await session.execute(sql_query, params)).one_or_none()
+        elif include:
+            sql_query = queries.COLLEGE_BY_ID.options(selectinload(College.CollegeTable.students))
+            result = (await session.exec(sql_query, params=params)).one_or_none()
+        else:
+            result = (await session.exec(queries.COLLEGE_BY_ID, params=params)).one_or_none()
 
         if not result:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="조회된 데이터가 없습니다")
+
+        versions = row_versions([result], "college_id", "students" if include else None, "student_id")
+        not_modified = check_etag(request, response, make_etag(request, versions))
+        if not_modified is not None:
+            return not_modified
         
+        if fields:
+            return render_fields(result, College.CollegeTable, fields, response)
+        if include:
+            return render_models(colleges_with_students([result])[0], College.CollegeReadWithStudents, response)
         return result
     except HTTPException:
         raise
@@ -90,29 +268,131 @@ def get_college_by_collge_id(
 # STUDENT ------------------------------------------------------------------------------------------------------------------------------------------------------------
 
 
-class Query_get_student_by_arage(BaseModel):
-    offset : int | None = Field(default=0, ge=0, description="학생 범위 조회를 위한 offset")
-    limit : int | None = Field(default=10, ge=1, description="학생 범위 조회를 위한 limit")
+# 학생 목록 조회와 내보내기(export)가 함께 사용하는 필터, 정렬 쿼리
+class Query_student_filter(BaseModel):
+    # 필터, college_id와 major는 둘 중 하나만 사용 가능
+    college_id : int | None = Field(default=None, description="단과대학 id가 같은 학생만 조회")
+    major : str | None = Field(default=None, description="전공이 같은 학생만 조회")
+    age_min : int | None = Field(default=None, ge=0, description="나이 하한(포함), sort=age 또는 sort=-age일 때만 사용 가능")
+    age_max : int | None = Field(default=None, ge=0, description="나이 상한(포함), sort=age 또는 sort=-age일 때만 사용 가능")
+    added_after : datetime | None = Field(default=None, description="추가된 시각 하한(포함), sort=added_at 또는 sort=-added_at일 때만 사용 가능")
+    added_before : datetime | None = Field(default=None, description="추가된 시각 상한(미포함), sort=added_at 또는 sort=-added_at일 때만 사용 가능")
+
+    sort : Literal["student_id", "-student_id", "age", "-age", "added_at", "-added_at"] = Field(
+        default="student_id", 
+        description="정렬 기준, 앞에 -를 붙이면 내림차순"
+    )
+
+    fields : str | None = Field(default=None, description="응답에 포함할 필드를 콤마로 구분, 예) student_id,name")
 
+    def filters(self):
+        return self.model_dump(include={"college_id", "major", "age_min", "age_max", "added_after", "added_before"})
 
-@router.get("/student", response_model=list[Student.StudentTable])
+
+class Query_get_student_by_arage(Query_student_filter):
+    offset : int | None = Field(default=0, ge=0, description="학생 범위 조회를 위한 offset, cursor가 있으면 무시됨")
+    limit : int | None = Field(default=10, ge=1, le=MAX_PAGE_SIZE, description="학생 범위 조회를 위한 limit")
+    cursor : str | None = Field(default=None, description="이전 응답의 X-Next-Cursor 헤더 값, 해당 페이지의 다음부터 조회")
+    ids : str | None = Field(default=None, description="조회할 student_id를 콤마로 구분, 예) 3,1,2, 있으면 offset, limit, sort는 무시되고 {items, missing}을 반환")
+    include : Literal["college"] | None = Field(default=None, description="college를 주면 각 학생의 단과대학 정보를 함께 반환")
+    count : Literal["exact", "estimated", "none"] = Field(default="none", description="전체 개수를 X-Total-Count 헤더로 반환, exact는 정확한 개수, estimated는 db 통계로 추정한 개수")
+
+
+class Query_export_student(Query_student_filter):
+    format : Literal["ndjson", "csv"] = Field(default="ndjson", description="내보낼 형식, ndjson은 한 줄에 json 하나, csv는 첫 줄이 칼럼 이름")
+
+
+# 모든 필터, 정렬 조합이 StudentTable에 선언한 인덱스 하나로 처리되도록 인덱스가 없는 조합은 막음
+# (college_id 또는 major 중 하나) + (정렬 칼럼) + (정렬 칼럼에 대한 범위 필터)
+def check_student_index_plan(q : Query_student_filter):
+    sort_key = q.sort.lstrip("-")
+
+    if q.college_id is not None and q.major is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="college_id와 major 필터는 함께 사용할 수 없습니다")
+    if (q.age_min is not None or q.age_max is not None) and sort_key != "age":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="나이 범위 필터는 sort=age 또는 sort=-age와 함께 사용해야 합니다")
+    if (q.added_after is not None or q.added_before is not None) and sort_key != "added_at":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="added_at 범위 필터는 sort=added_at 또는 sort=-added_at와 함께 사용해야 합니다")
+
+
+@router.get("/student", response_model=list[Student.StudentTable], description="학생 범위 조회 API, 다음 페이지가 있으면 X-Next-Cursor 헤더로 커서를 반환, ids로 여러 학생을 한 번에 조회 가능")
 async def get_student_by_arange(
     q : Annotated[Query_get_student_by_arage, Query(description="학생 범위 조회를 위한 쿼리")],
-    session : Session = Depends(get_session)
+    request : Request,
+    response : Response,
+    session : ReadSession = Depends(get_read_session, scope="function")
 ):
     
     try:
-        sql_query = (
-            select(Student.StudentTable)
-            .offset(q.offset)
-            .limit(q.limit)
-        )
-
-        results = session.exec(sql_query).all()
-
-        if not len(results):
+        check_student_index_plan(q)
+        fields = parse_fields(q.fields, Student.StudentTable)
+        check_include(fields, q.include)
+        fields = default_fields(Student.StudentTable, fields, q.include)
+        sort_key = q.sort.lstrip("-")
+        ids = parse_ids(q.ids)
+        if ids and (q.cursor or any(value is not None for value in q.filters().values())):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids는 cursor, 필터와 함께 사용할 수 없습니다")
+        check_count(ids, q.count)
+
+        after = None
+        if q.cursor:
+            sort_value, pk = decode_cursor(q.cursor, q.sort)
+            try:
+                after = (queries.parse_student_sort_value(sort_key, sort_value), pk)
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="잘못된 커서입니다")
+
+        if ids:
+            sql_query, params = queries.STUDENT_BY_IDS, {"ids" : list(ids)}
+        else:
+            sql_query, params = queries.student_list_query(
+                sort=q.sort, 
+                offset=q.offset, 
+                limit=q.limit, 
+                after=after, 
+                **q.filters()
+            ), None
+        if q.include:
+            sql_query = sql_query.options(selectinload(Student.StudentTable.collge))
+
+        if fields: # 요청한 칼럼 + 커서를 만들기 위한 정렬 칼럼, 기본키 + ETag를 만들기 위한 버전만 조회
+            sql_query = sql_query.with_only_columns(*select_columns(Student.StudentTable, fields, sort_key, "student_id", "version"))
+
+        total = None
+        conditions = queries.student_filter_conditions(**q.filters())
+        if q.count == "exact":
+            sql_query = with_exact_count(sql_query, Student.StudentTable, conditions)
+            results, total = split_exact_count((await session.execute(sql_query, params)).all(), entity=not fields)
+        elif fields:
+            results = (await session.execute(sql_query, params)).all()
+        else:
+            results = (await session.exec(sql_query, params=params)).all()
+
+        if q.count == "estimated":
+            total = await estimate_count(session, Student.StudentTable, conditions)
+
+        if not ids and not len(results):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="조회된 데이터가 없습니다")
         
+        if not ids:
+            set_next_cursor(response, results, q.limit, q.sort, sort_key, "student_id")
+        if total is not None:
+            set_total_count(response, total, q.count)
+
+        versions = row_versions(results, "student_id", "collge" if q.include else None, "college_id")
+        not_modified = check_etag(request, response, make_etag(request, (versions, total)))
+        if not_modified is not None:
+            return not_modified
+
+        if ids:
+            return render_ids(
+                results, ids, Student.StudentTable, "student_id", fields, 
+                Student.StudentReadWithCollege if q.include else None, students_with_college, response
+            )
+        if fields:
+            return render_fields(results, Student.StudentTable, fields, response)
+        if q.include:
+            return render_models(students_with_college(results), Student.StudentReadWithCollege, response)
         return results
     
     except HTTPException:
@@ -126,23 +406,143 @@ async def get_student_by_arange(
 
 
 
-@router.get("/student/{student_id}")
-def get_student_by_student_id(
-    student_id : Annotated[str, Path(description="student_id로 단일 조회하기 위한 파라미터입니다")],
-    session : Session = Depends(get_session)
+# 필터에 맞는 학생 전체를 형식에 맞춰 흘려보냄, /student/{student_id}보다 먼저 선언해야 export(search)가 student_id로 해석되지 않음
+@router.get("/student/export", description="학생 데이터 내보내기 API, 목록 조회와 같은 필터, 정렬을 사용하며 결과 전체를 ndjson 또는 csv로 스트리밍")
+async def export_students(
+    q : Annotated[Query_export_student, Query(description="내보낼 학생을 고르기 위한 쿼리")],
+    request : Request
 ):
+    check_student_index_plan(q)
+    fields = parse_fields(q.fields, Student.StudentTable) or tuple(Student.StudentTable.model_fields)
+
+    sql_query = queries.student_list_query(sort=q.sort, limit=None, **q.filters())
+    sql_query = sql_query.with_only_columns(*select_columns(Student.StudentTable, fields))
+
+    # 세션 대신 엔진을 넘겨서 제너레이터가 스트리밍하는 동안에만 연결을 사용하도록 함
+    writer = EXPORT_WRITERS[q.format]
+    return StreamingResponse(
+        writer(pick_read_engine(request), sql_query, Student.StudentTable, fields),
+        media_type=EXPORT_MEDIA_TYPES[q.format],
+        headers={**EXPORT_HEADERS, "Content-Disposition" : f'attachment; filename="students.{q.format}"'}
+    )
+
+
+
+# /post/students/import의 진행 상황, 가져오는 동안 계속 바뀌기 때문에 캐시(조회 결과 캐시, nginx)를 거치지 않고 primary에서 바로 읽음
+@router.get("/student/import/{import_id}", response_model=Import.StudentImportTable, description="학생 명단 가져오기 진행 상황 조회 API")
+async def get_student_import(
+    import_id : Annotated[int, Path(description="가져오기를 시작할 때 받은 import_id")],
+    response : Response
+):
+    response.headers["Cache-Control"] = "no-store"
     try:
+        progress = await get_progress(async_engine, import_id)
+    except Exception as e:
+        print(f">>>>> Error Messege <<<<< \n {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="가져오기 진행 상황을 조회하는 도중 오류가 발생했습니다"
+        )
+
+    if progress is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="존재하지 않는 가져오기입니다")
+    return progress
 
-        sql_query = (
-            select(Student.StudentTable)
-            .where(Student.StudentTable.student_id == student_id)
+
+@router.get("/student/search", response_model=list[Student.StudentTable], description="학생 이름 검색 API, 부분 문자열 또는 비슷한 이름을 유사도 순으로 반환")
+async def search_student(
+    q : Annotated[Query_search, Query(description="검색을 위한 쿼리입니다")],
+    request : Request,
+    response : Response,
+    session : ReadSession = Depends(get_read_session, scope="function")
+):
+    try:
+        table = Student.StudentTable
+        return await run_search(q, table, table.name, table.student_id, "student_id", request, response, session)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f">>>> Error message <<<< \n {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="학생 데이터를 검색하는 도중 오류가 발생했습니다"
         )
 
-        result = session.exec(sql_query).one_or_none()
+
+
+# 검색창에 입력할 때마다 호출되기 때문에 db 대신 워커 메모리의 이름 인덱스(autocomplete.py)에서 찾음
+# 인덱스를 아직 불러오지 못한 경우에만 db에서 찾음, 후보가 없는 것은 오류가 아니기 때문에 404 대신 빈 리스트를 반환
+class Query_autocomplete(BaseModel):
+    prefix : str = Field(min_length=1, max_length=SEARCH_MAX_LENGTH, description="이름의 앞부분")
+    limit : int = Field(default=10, ge=1, le=MAX_AUTOCOMPLETE, description="반환할 최대 후보 수")
+
+
+@router.get("/student/autocomplete", response_model=list[Student.StudentName], description="학생 이름 자동완성 API, prefix로 시작하는 이름을 이름 순으로 반환")
+async def autocomplete_student(
+    q : Annotated[Query_autocomplete, Query(description="자동완성을 위한 쿼리입니다")],
+    session : ReadSession = Depends(get_read_session, scope="function")
+):
+    try:
+        prefix = normalize_query(q.prefix)
+        if student_names.ready:
+            results = student_names.lookup(prefix, q.limit)
+        else:
+            name = Student.StudentTable.name
+            sql_query = (
+                select(Student.StudentTable.student_id, name)
+                .where(name.like(f"{escape_like(prefix)}%", escape="\\"))
+                .order_by(name.collate("C")) # 메모리 인덱스와 같은 순서
+                .limit(q.limit)
+            )
+            results = (await session.execute(sql_query)).all()
+        return [{"student_id" : student_id, "name" : name} for student_id, name in results]
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f">>>> Error message <<<< \n {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="학생 이름을 찾는 도중 오류가 발생했습니다"
+        )
+
+
+
+@router.get("/student/{student_id}")
+async def get_student_by_student_id(
+    student_id : Annotated[int, Path(description="student_id로 단일 조회하기 위한 파라미터입니다")],
+    request : Request,
+    response : Response,
+    fields : Annotated[str | None, Query(description="응답에 포함할 필드를 콤마로 구분, 예) student_id,name")] = None,
+    include : Annotated[Literal["college"] | None, Query(description="college를 주면 단과대학 정보를 함께 반환")] = None,
+    session : ReadSession = Depends(get_read_session, scope="function")
+):
+    try:
+        fields = parse_fields(fields, Student.StudentTable)
+        check_include(fields, include)
+        fields = default_fields(Student.StudentTable, fields, include)
+        params = {"student_id" : student_id}
+
+        if fields:
+            sql_query = queries.STUDENT_BY_ID.with_only_columns(*select_columns(Student.StudentTable, fields, "student_id", "version"))
+            result = (await session.execute(sql_query, params)).one_or_none()
+        elif include:
+            sql_query = queries.STUDENT_BY_ID.options(selectinload(Student.StudentTable.collge))
+            result = (await session.exec(sql_query, params=params)).one_or_none()
+        else:
+            result = (await session.exec(queries.STUDENT_BY_ID, params=params)).one_or_none()
 
         if not result:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="조회된 데이터가 없습니다")
+
+        versions = row_versions([result], "student_id", "collge" if include else None, "college_id")
+        not_modified = check_etag(request, response, make_etag(request, versions))
+        if not_modified is not None:
+            return not_modified
         
+        if fields:
+            return render_fields(result, Student.StudentTable, fields, response)
+        if include:
+            return render_models(students_with_college([result])[0], Student.StudentReadWithCollege, response)
         return result
 
     except HTTPException:
@@ -1,34 +1,50 @@
 from enum import Enum
 from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from fastapi import Path, Query, Body
 from fastapi import HTTPException, status
-from sqlmodel import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from util import get_session
-from models import Student, College # models에 정의된 객체들을 가져옴
+from datetime import datetime
+
+from util import get_async_session, async_engine
+from http_cache import cache_headers
+from college_replica import colleges
+from autocomplete import student_names
+from models import Student, College, Bulk, Import, Stats # models에 정의된 객체들을 가져옴
+from bulk import BULK_MAX_ITEMS, BulkReport, mark_duplicates, insert_rows
+from importer import IMPORT_MEDIA_TYPES, run_import
+import stats
 
 
 router = APIRouter(
     prefix="/post",
     tags=["Post Api"], # api 문서 자동화시 사용할 tag, 각 api가 어느 라우터에 해당하는지 알 수 있음
-    responses={404 : {"description" : "Not Found"}} # 라우터로 요청을 넘기고 404코드가 반환될 때 클라이언트로 전달할 데이터를 설정
+    responses={404 : {"description" : "Not Found"}}, # 라우터로 요청을 넘기고 404코드가 반환될 때 클라이언트로 전달할 데이터를 설정
+    dependencies=[Depends(cache_headers)] # 모든 응답에 nginx 마이크로 캐시용 Cache-Control, Surrogate-Key 헤더를 설정(http_cache.py 참고)
 )
 
 
 @router.post('/college', response_model=College.CollegeTable)
 async def post_college(
     college : Annotated[College.CollegeCreate, Body(description="단과대 포스팅을 위한 요청바디입니다")],
-    session : Session = Depends(get_session)
+    session : AsyncSession = Depends(get_async_session, scope="function")
 ):
     
+    # 워커 메모리의 Colleges 사본으로 중복된 이름을 db에 보내기 전에 걸러냄
+    if colleges.ready and colleges.get_by_name(college.college_name) is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="이미 존재하는 단과대학 이름입니다")
+
     try:
         college_orm = College.CollegeTable.model_validate(college) # 요청 body를 이용해서 orm객체를 생성
 
         session.add(college_orm) # db 버퍼상에 college_orm을 추가
-        session.commit() # 실제 db상에 반영
-        session.refresh(college_orm) # db에 넣는 도중에 새롭게 추가된 id 등의 칼럼을 college_orm에 동기화
+        await session.flush() # 트랜잭션 안에서 db로 insert를 보냄
+        await session.refresh(college_orm) # db에 넣는 도중에 새롭게 추가된 id 등의 칼럼을 college_orm에 동기화
+        await session.commit() # 실제 db상에 반영, commit을 마지막 DB 작업으로 두어야 응답을 만드는 동안 연결을 붙잡고 있지 않음
+        colleges.upsert(college_orm) # 다른 워커는 NOTIFY로 갱신되고, 요청을 처리한 워커는 알림을 기다리지 않고 바로 반영함
 
         return college_orm
 
@@ -36,7 +52,7 @@ async def post_college(
         # session을 통해 db에 작업들을 하기 전으로 복귀, 개발하다보면 특정 비지니즈 로직을 위해 복수의 테이블을 건드려야 할 때가 있음
         # 이 때 A 테이블은 잘 건드렸다가 B테이블은 잘못건드려서 오류가 발생했다면 안전성을 위해 A테이블에 작업한 내용도 없던일이 되어야 함
         # 따라서 rollback 메소드는 이를 편리하게 관리하도록 해줌
-        session.rollback() 
+        await session.rollback() 
 
         print(f"error message \n {str(e)}")
     
@@ -50,23 +66,171 @@ async def post_college(
 @router.post('/student', response_model=Student.StudentTable)
 async def post_student(
     student : Annotated[Student.StudentCreate, Body(description="학생 포스팅을 위한 요청 바디입니다")],
-    session : Session = Depends(get_session)
+    session : AsyncSession = Depends(get_async_session, scope="function")
 ):
-    
+    # 존재하지 않는 단과대학이면 db의 외래키 오류(500)까지 가지 않고 워커 메모리의 Colleges 사본으로 바로 확인함
+    if student.college_id is not None and colleges.ready and colleges.get(student.college_id) is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="존재하지 않는 단과대학입니다")
+
     try:
         student_orm = Student.StudentTable.model_validate(student)
 
         session.add(student_orm)
-        session.commit()
-        session.refresh(student_orm)
+        await session.flush()
+        await session.refresh(student_orm)
+        await session.commit()
+        student_names.add(student_orm.name, student_orm.student_id)
 
         return student_orm
 
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         print(f"error message \n {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Students table에 데이터를 추가하는 도중 오류가 발생했습니다"
         )
-    
+
+
+
+# 대량 추가 ---------------------------------------------------------------------------------------------------------------------------------------------------------
+# 자세한 내용은 bulk.py 참고, 항목마다 결과(created, conflict, invalid)를 요청 순서대로 반환함
+
+@router.post('/colleges/bulk', response_model=Bulk.BulkInsertResult, description=f"단과대 대량 추가 API, 한 번에 최대 {BULK_MAX_ITEMS}개까지 추가하고 이미 있는 이름은 conflict로 반환")
+async def post_colleges_bulk(
+    college_list : Annotated[list[College.CollegeCreate], Body(min_length=1, max_length=BULK_MAX_ITEMS, description="추가할 단과대 리스트입니다")],
+    session : AsyncSession = Depends(get_async_session, scope="function")
+):
+    report = BulkReport(len(college_list))
+    names = [college.college_name for college in college_list]
+    mark_duplicates(report, names, "요청 안에서 중복된 단과대학 이름입니다")
+    for index in report.pending():
+        if colleges.ready and colleges.get_by_name(names[index]) is not None:
+            report.conflict(index, "이미 존재하는 단과대학 이름입니다")
+
+    pending = report.pending()
+    try:
+        table = College.CollegeTable.__table__
+        inserted = await insert_rows(
+            session, table,
+            [college_list[index].model_dump() for index in pending],
+            "college_name", table.c
+        )
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        print(f"error message \n {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Colleges table에 데이터를 추가하는 도중 오류가 발생했습니다"
+        )
+
+    by_name = {row.college_name : row for row in inserted}
+    for index in pending:
+        row = by_name.get(names[index])
+        if row is None:
+            report.conflict(index, "이미 존재하는 단과대학 이름입니다")
+        else:
+            report.created(index, row.college_id)
+            colleges.upsert(dict(row._mapping))
+    return report.result()
+
+
+async def find_unknown_colleges(session : AsyncSession, college_ids : set[int]):
+    """존재하지 않는 단과대학 id, 워커 메모리의 Colleges 사본이 준비되지 않았다면 db에서 한 번에 확인함"""
+    if not college_ids:
+        return set()
+    if colleges.ready:
+        return {college_id for college_id in college_ids if colleges.get(college_id) is None}
+    found = await session.exec(select(College.CollegeTable.college_id).where(College.CollegeTable.college_id.in_(college_ids)))
+    return college_ids - set(found.all())
+
+
+@router.post('/students/bulk', response_model=Bulk.BulkInsertResult, description=f"학생 대량 추가 API, 한 번에 최대 {BULK_MAX_ITEMS}명까지 추가하고 이미 있는 이름은 conflict로 반환")
+async def post_students_bulk(
+    student_list : Annotated[list[Student.StudentCreate], Body(min_length=1, max_length=BULK_MAX_ITEMS, description="추가할 학생 리스트입니다")],
+    session : AsyncSession = Depends(get_async_session, scope="function")
+):
+    report = BulkReport(len(student_list))
+    names = [student.name for student in student_list]
+    mark_duplicates(report, names, "요청 안에서 중복된 이름입니다")
+
+    try:
+        # 존재하지 않는 단과대학을 가리키는 행이 하나라도 있으면 외래키 오류로 청크 전체가 실패하기 때문에 미리 걸러냄
+        unknown = await find_unknown_colleges(session, {student.college_id for student in student_list if student.college_id is not None})
+        for index in report.pending():
+            if student_list[index].college_id in unknown:
+                report.invalid(index, "존재하지 않는 단과대학입니다")
+
+        pending = report.pending()
+        added_at = datetime.now() # StudentTable.added_at의 default_factory와 같은 값, 요청 하나에서 추가한 학생은 같은 시각을 가짐
+        table = Student.StudentTable.__table__
+        inserted = await insert_rows(
+            session, table,
+            [{**student_list[index].model_dump(), "added_at" : added_at} for index in pending],
+            "name", (table.c.student_id, table.c.name)
+        )
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        print(f"error message \n {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Students table에 데이터를 추가하는 도중 오류가 발생했습니다"
+        )
+
+    by_name = {row.name : row.student_id for row in inserted}
+    for index in pending:
+        student_id = by_name.get(names[index])
+        if student_id is None:
+            report.conflict(index, "이미 존재하는 이름입니다")
+        else:
+            report.created(index, student_id)
+    student_names.add_many(list(by_name.items()))
+    return report.result()
+
+
+
+# 명단 가져오기 ---------------------------------------------------------------------------------------------------------------------------------------------------
+# 본문을 Body로 받으면 fastapi가 전체를 메모리에 읽은 뒤에 핸들러를 호출하기 때문에 request.stream()으로 받은 만큼씩 읽음(importer.py 참고)
+# 본문 형식은 api 문서에만 표시함(openapi_extra)
+@router.post(
+    '/students/import',
+    response_model=Import.StudentImportTable,
+    description="학생 명단 가져오기 API, ndjson 또는 csv 본문을 스트리밍으로 받아서 COPY로 넣고 진행 상황은 /get/student/import/{import_id}로 조회",
+    openapi_extra={"requestBody" : {"required" : True, "content" : {media_type : {"schema" : {"type" : "string"}} for media_type in IMPORT_MEDIA_TYPES.values()}}}
+)
+async def import_students(
+    request : Request,
+    format : Annotated[Import.ImportFormat, Query(description="본문 형식, ndjson은 한 줄에 StudentCreate json 하나, csv는 첫 줄이 칼럼 이름")] = "ndjson",
+    on_conflict : Annotated[Import.ImportConflict, Query(description="이미 있는 이름을 skip이면 건너뛰고 update면 나이, 전공, 단과대학을 덮어씀")] = "skip"
+):
+    try:
+        return await run_import(async_engine, request.stream(), format, on_conflict)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"error message \n {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="학생 명단을 가져오는 도중 오류가 발생했습니다"
+        )
+
+
+# 통계 갱신 ------------------------------------------------------------------------------------------------------------------------------------------------------
+# view를 바로 다시 집계함, 쓰기 작업이기 때문에 조회용 replica가 아닌 primary에서 실행하고
+# /get/ 경로가 아니기 때문에 single-flight, nginx 마이크로 캐시를 거치지 않음
+@router.post('/stats/refresh', response_model=Stats.StatsRefreshResult, description="통계 materialized view를 바로 갱신")
+async def refresh_stats():
+    try:
+        result = await stats.refresh_views(async_engine)
+    except Exception as e:
+        print(f">>>>> Error Messege <<<<< \n {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="통계를 갱신하는 도중 오류가 발생했습니다"
+        )
+
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="다른 요청이 통계를 갱신하는 중입니다")
+    return result
@@ -0,0 +1,90 @@
+from typing import Annotated, Literal
+
+from fastapi import APIRouter
+from fastapi import Query
+from fastapi import HTTPException, status
+from fastapi import Depends, Response
+
+from util import ReadSession, get_read_session
+from http_cache import cache_headers
+from models import Stats
+import stats
+
+
+
+router = APIRouter(
+    prefix="/get/stats",
+    tags=["Stats Api"], # api 문서 자동화시 사용할 tag, 각 api가 어느 라우터에 해당하는지 알 수 있음
+    responses={404 : {"description" : "Not Found"}}, # 라우터로 요청을 넘기고 404코드가 반환될 때 클라이언트로 전달할 데이터를 설정
+    dependencies=[Depends(cache_headers)] # 모든 응답에 nginx 마이크로 캐시용 Cache-Control, Surrogate-Key 헤더를 설정(http_cache.py 참고)
+)
+
+
+# 통계는 모두 db에서 GROUP BY로 집계한 결과만 받아옴, 자세한 내용은 stats.py 참고
+Source = Annotated[Literal["live", "view"], Query(description="live는 Students를 직접 집계, view는 미리 집계해둔 materialized view를 읽음(X-Stats-Refreshed-At 시점의 값)")]
+
+
+async def set_refreshed_at(session : ReadSession, response : Response, use_view : bool):
+    if use_view:
+        refreshed_at = (await session.execute(stats.REFRESHED_AT_QUERY)).scalar_one()
+        response.headers[stats.REFRESHED_AT_HEADER] = refreshed_at.isoformat()
+
+
+
+@router.get("/colleges", response_model=list[Stats.CollegeStudentCount], description="단과대학별 학생 수")
+async def get_college_stats(
+    response : Response,
+    source : Source = "live",
+    session : ReadSession = Depends(get_read_session, scope="function")
+):
+    try:
+        use_view = source == "view"
+        results = (await session.execute(stats.college_counts_query(use_view))).all()
+        await set_refreshed_at(session, response, use_view)
+        return [row._mapping for row in results]
+    except Exception as e:
+        print(f">>>>> Error Messege <<<<< \n {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="통계를 조회하는 도중 오류가 발생했습니다"
+        )
+
+
+@router.get("/majors", response_model=list[Stats.MajorStudentCount], description="전공별 학생 수, 학생 수가 많은 순")
+async def get_major_stats(
+    response : Response,
+    source : Source = "live",
+    session : ReadSession = Depends(get_read_session, scope="function")
+):
+    try:
+        use_view = source == "view"
+        results = (await session.execute(stats.major_counts_query(use_view))).all()
+        await set_refreshed_at(session, response, use_view)
+        return [row._mapping for row in results]
+    except Exception as e:
+        print(f">>>>> Error Messege <<<<< \n {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="통계를 조회하는 도중 오류가 발생했습니다"
+        )
+
+
+@router.get("/ages", response_model=Stats.AgeStats, description="나이 분포, 최소, 최대, 평균과 bucket 크기의 구간별 학생 수")
+async def get_age_stats(
+    response : Response,
+    bucket : Annotated[int, Query(ge=1, le=100, description="히스토그램 구간 크기(살)")] = 5,
+    source : Source = "live",
+    session : ReadSession = Depends(get_read_session, scope="function")
+):
+    try:
+        use_view = source == "view"
+        results = (await session.execute(stats.age_histogram_query(use_view, bucket))).all()
+        await set_refreshed_at(session, response, use_view)
+        return stats.summarize_ages(results, bucket)
+    except Exception as e:
+        print(f">>>>> Error Messege <<<<< \n {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="통계를 조회하는 도중 오류가 발생했습니다"
+        )
+
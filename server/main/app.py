@@ -1,13 +1,17 @@
-from fastapi import FastAPI, Depends
-from sqlmodel import Session
+from fastapi import FastAPI
 
 import os
 
 # /models/__init__.py에 테이블 객체를 임포팅 하는 코드가 추가되어 있기 때문에 models를 임포팅 하면 자동으로 정의해둔 테이블 객체들이 임포팅 됨 
 # 이는 테이블을 처음에 초기화 할 때 SQLModel.metadata에 정의한 테이블 객체가 등록하는 것임
-from util import create_db_and_tables, get_session
+from util import create_db_and_tables, get_pool_stats
+from cache import get_cache_stats
+from college_replica import colleges
+from compression import COMPRESSION_LAYER, CompressionMiddleware, get_compression_stats
+from singleflight import SingleFlightMiddleware, single_flight
+from autocomplete import student_names
 
-from Routers import post, get, put, delete
+from Routers import post, get, put, delete, stats
 
 
 mode = os.getenv("MODE", "dev")
@@ -28,8 +32,53 @@ app.include_router(post.router)
 app.include_router(get.router)
 app.include_router(put.router)
 app.include_router(delete.router)
+app.include_router(stats.router)
 
+# 나중에 추가한 미들웨어가 바깥쪽에서 실행됨, 같은 조회 요청을 합친 뒤(singleflight.py) 요청마다 압축함
+app.add_middleware(SingleFlightMiddleware)
 
+# 응답 압축, COMPRESSION_LAYER=nginx 또는 off이면 앱에서는 압축하지 않음(compression.py 참고)
+if COMPRESSION_LAYER == "app":
+    app.add_middleware(CompressionMiddleware)
+
+
+# 서버가 요청을 받을 수 있는지만 확인하는 용도이기 때문에 세션을 만들지 않음, DB 연결을 하나도 사용하지 않음
 @app.get("/health") 
-def health_check(session: Session = Depends(get_session)):
-    return {"status": "ok"}
\ No newline at end of file
+def health_check():
+    return {"status": "ok"}
+
+
+# 요청을 받은 워커의 커넥션 풀 상태를 확인, 워커가 여러 개라면 요청할 때마다 다른 워커의 값이 보일 수 있음
+@app.get("/health/pool")
+def pool_stats():
+    return get_pool_stats()
+
+
+# 요청을 받은 워커의 조회 결과 캐시 상태(hit, miss, 삭제 횟수 등)를 확인
+@app.get("/health/cache")
+def cache_stats():
+    return get_cache_stats()
+
+
+# 요청을 받은 워커가 들고 있는 Colleges 사본의 상태를 확인
+@app.get("/health/colleges")
+def college_replica_stats():
+    return colleges.stats()
+
+
+# 요청을 받은 워커의 응답 압축 설정과 압축한 본문 캐시 상태(hit, miss, 크기)를 확인
+@app.get("/health/compression")
+def compression_stats():
+    return get_compression_stats()
+
+
+# 요청을 받은 워커에서 합쳐진 조회 요청 수(leader 하나에 followers가 합쳐짐)를 확인
+@app.get("/health/singleflight")
+def single_flight_stats():
+    return single_flight.stats()
+
+
+# 요청을 받은 워커가 들고 있는 학생 이름 자동완성 인덱스의 상태(이름 수, 메모리, 로딩 시간)를 확인
+@app.get("/health/autocomplete")
+def autocomplete_stats():
+    return student_names.stats()
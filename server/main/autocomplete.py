@@ -0,0 +1,211 @@
+from array import array
+from bisect import bisect_left
+
+from sqlmodel import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from models import Student
+
+import os
+import sys
+import time
+import asyncio
+import unicodedata
+
+
+# 학생 이름 자동완성용 접두사 인덱스 --------------------------------------------------------------------------------------------------------------------------------
+# 검색창에 글자를 입력할 때마다 db에 쿼리를 보내지 않도록 워커마다 학생 이름 전체를 정렬된 배열로 들고 있다가 이진 탐색으로 접두사를 찾음
+# 접두사로 시작하는 이름은 정렬된 배열에서 연속해 있기 때문에 bisect로 첫 위치를 찾고 limit개만 읽으면 됨 -> O(log n + limit)
+#
+# 메모리를 줄이기 위해 이름은 str 대신 UTF-8 bytes로, student_id는 int 객체 대신 array('q')로 들고 있음
+# 한글은 str로 들고 있으면 글자당 2바이트 + 객체 헤더가 74바이트라서 bytes(글자당 3바이트 + 헤더 33바이트)가 더 작음
+# UTF-8 bytes의 대소 비교는 유니코드 코드 포인트 순서와 같기 때문에 db에서도 COLLATE "C"(바이트 순서)로 정렬해서 받아오면 그대로 사용할 수 있음
+# 단 이름은 NFC로 정규화해서 들고 있기 때문에 NFC가 아닌 이름이 있으면 불러온 뒤 다시 정렬함(load 참고)
+# 1M명 기준 : "bench0000001" 형태 약 58MiB(한글 2~4글자는 약 56MiB), 로딩 약 5.7초(대부분 db 정렬, 전송 시간), 조회 약 2.4µs
+# 로딩은 서버 시작을 막지 않도록 백그라운드 태스크로 실행하고, 끝나기 전까지는 db에서 직접 찾음
+#
+# 요청을 처리한 워커는 post/put/delete 핸들러가 commit 직후 바로 반영하고
+# 다른 워커에서 바뀐 이름은 AUTOCOMPLETE_REFRESH초마다 전체를 다시 불러올 때 반영됨(그 사이에는 최대 해당 시간만큼 늦을 수 있음)
+AUTOCOMPLETE_REFRESH = float(os.getenv("AUTOCOMPLETE_REFRESH", "300"))
+AUTOCOMPLETE_BATCH_SIZE = 10_000
+MAX_AUTOCOMPLETE = 50 # 한 번에 반환할 수 있는 최대 후보 수
+AUTOCOMPLETE_MERGE_THRESHOLD = 64 # add_many에서 이보다 많으면 하나씩 넣지 않고 병합함
+
+
+def normalize_prefix(prefix : str):
+    return unicodedata.normalize("NFC", prefix).strip()
+
+
+class StudentNameIndex:
+
+    def __init__(self):
+        self.names : list[bytes] = [] # 정렬된 이름
+        self.ids = array("q") # names와 같은 위치에 해당 학생의 student_id
+
+        self.ready = False
+        self._pending : list[tuple] | None = None # 전체를 다시 불러오는 동안 핸들러가 반영한 변경
+        self._task : asyncio.Task | None = None
+
+        self.loaded_at : float | None = None
+        self.build_seconds : float | None = None
+        self.reloads = 0
+
+
+    # 조회 --------------------------------------------------------------------------------------------------------------------------------------------------------
+
+    def lookup(self, prefix : str, limit : int = 10):
+        """prefix로 시작하는 이름을 이름 순으로 최대 limit개 반환, [(student_id, name), ...]"""
+        key = normalize_prefix(prefix).encode()
+        names = self.names
+        results = []
+        i = bisect_left(names, key)
+        while i < len(names) and len(results) < limit and names[i].startswith(key):
+            results.append((self.ids[i], names[i].decode()))
+            i += 1
+        return results
+
+
+    # 갱신 --------------------------------------------------------------------------------------------------------------------------------------------------------
+    # 배열 중간에 넣고 빼는 비용은 O(n)이지만 포인터를 옮기는 memmove라서 1M명에서도 한 번에 약 0.25ms임
+
+    def add(self, name : str, student_id : int):
+        self._record(("add", name, student_id))
+        self._insert(unicodedata.normalize("NFC", name).encode(), student_id)
+
+    def add_many(self, pairs : list[tuple[str, int]]):
+        """
+        [(name, student_id), ...]를 한 번에 추가(/post/students/bulk)
+        하나씩 넣으면 이름마다 O(n)이라서 20만 명에 1만 명을 넣으면 약 2.5초가 걸림
+        많으면 새 이름을 정렬한 뒤 기존 배열과 한 번에 병합해서 새 배열을 만듦 -> O(n + k log k), 같은 경우 약 35ms
+        """
+        self._record(("add_many", pairs))
+        added = sorted((unicodedata.normalize("NFC", name).encode(), student_id) for name, student_id in pairs)
+        if len(added) < AUTOCOMPLETE_MERGE_THRESHOLD:
+            for key, student_id in added:
+                self._insert(key, student_id)
+            return
+
+        old_names, old_ids = self.names, self.ids
+        names, ids = [], array("q")
+        start = 0
+        for key, student_id in added:
+            i = bisect_left(old_names, key, start)
+            names.extend(old_names[start:i])
+            ids.extend(old_ids[start:i])
+            start = i + 1 if i < len(old_names) and old_names[i] == key else i # 이미 있는 이름은 id만 바꿈
+            if names and names[-1] == key:
+                ids[-1] = student_id
+            else:
+                names.append(key)
+                ids.append(student_id)
+        names.extend(old_names[start:])
+        ids.extend(old_ids[start:])
+        self.names, self.ids = names, ids # 병합하는 동안 await가 없기 때문에 조회는 항상 이전 배열 또는 새 배열 전체를 봄
+
+    def _insert(self, key : bytes, student_id : int):
+        i = bisect_left(self.names, key)
+        if i < len(self.names) and self.names[i] == key: # name은 unique라서 같은 이름이 있다면 id만 바꿈
+            self.ids[i] = student_id
+            return
+        self.names.insert(i, key)
+        self.ids.insert(i, student_id)
+
+    def remove(self, name : str):
+        self._record(("remove", name))
+        key = unicodedata.normalize("NFC", name).encode()
+        i = bisect_left(self.names, key)
+        if i < len(self.names) and self.names[i] == key:
+            del self.names[i]
+            del self.ids[i]
+
+    def rename(self, old_name : str, new_name : str, student_id : int):
+        if old_name != new_name:
+            self.remove(old_name)
+            self.add(new_name, student_id)
+
+    def _record(self, change : tuple):
+        if self._pending is not None:
+            self._pending.append(change)
+
+    def memory_bytes(self):
+        """배열과 이름 bytes 객체가 차지하는 메모리(추정치), 1M명이면 수십 ms가 걸리기 때문에 상태 확인용으로만 사용"""
+        return sys.getsizeof(self.names) + sum(map(sys.getsizeof, self.names)) + sys.getsizeof(self.ids)
+
+
+    # 전체 불러오기 ------------------------------------------------------------------------------------------------------------------------------------------------
+
+    async def load(self, engine : AsyncEngine):
+        started = time.perf_counter()
+        self._pending = []
+        try:
+            names, ids = [], array("q")
+            ordered = True
+            name = Student.StudentTable.name
+            # 파이썬에서 다시 정렬하지 않도록 bytes 비교와 같은 순서(COLLATE "C")로 받아옴
+            statement = select(Student.StudentTable.student_id, name).order_by(name.collate("C"))
+            async with engine.connect() as conn:
+                result = await conn.stream(statement.execution_options(yield_per=AUTOCOMPLETE_BATCH_SIZE))
+                async for rows in result.partitions():
+                    for student_id, student_name in rows:
+                        key = unicodedata.normalize("NFC", student_name).encode()
+                        if ordered and names and key < names[-1]:
+                            ordered = False
+                        names.append(key)
+                        ids.append(student_id)
+
+            # db에는 이름이 들어온 그대로(NFD로 분해된 한글 등) 저장되어 있어서 NFC로 바꾸면 db 순서와 달라질 수 있음
+            # 순서가 어긋난 이름이 하나라도 있으면 bisect가 이름을 놓치지 않도록 파이썬에서 다시 정렬함
+            if not ordered:
+                order = sorted(range(len(names)), key=names.__getitem__)
+                names, ids = [names[i] for i in order], array("q", (ids[i] for i in order))
+
+            self.names, self.ids = names, ids
+            pending, self._pending = self._pending, None
+            for op, *args in pending: # 불러오는 동안 commit된 변경은 불러온 결과에 빠져 있을 수 있기 때문에 다시 반영
+                getattr(self, op)(*args)
+        finally:
+            self._pending = None
+
+        self.ready = True
+        self.loaded_at = time.time()
+        self.build_seconds = time.perf_counter() - started
+        self.reloads += 1
+
+    async def _run(self, engine : AsyncEngine):
+        # 첫 로딩도 여기서 하기 때문에 서버 시작(lifespan)은 전체 이름을 불러올 때까지 기다리지 않음
+        # 불러오기 전까지(ready=False) 조회 라우터는 db에서 LIKE 'prefix%'로 찾고, 실패하면 다음 주기에 다시 시도함
+        while True:
+            try:
+                await self.load(engine)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f">>>>> Student name index error <<<<< \n {str(e)}")
+            if AUTOCOMPLETE_REFRESH <= 0:
+                return
+            await asyncio.sleep(AUTOCOMPLETE_REFRESH)
+
+    def start(self, engine : AsyncEngine):
+        self._task = asyncio.create_task(self._run(engine))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "ready" : self.ready,
+            "names" : len(self.names),
+            "memory_bytes" : self.memory_bytes(),
+            "build_seconds" : self.build_seconds,
+            "loaded_at" : self.loaded_at,
+            "reloads" : self.reloads
+        }
+
+
+student_names = StudentNameIndex()
@@ -0,0 +1,57 @@
+from functools import lru_cache
+from typing_extensions import TypedDict # python 3.11에서는 pydantic이 typing_extensions의 TypedDict만 지원함
+
+from pydantic import TypeAdapter
+from fastapi import HTTPException, Response, status
+
+from pagination import MAX_PAGE_SIZE
+
+
+# 화면 하나를 그리기 위해 /get/student/{student_id}를 수십 번 호출하면 요청, 세션, db 왕복이 id 개수만큼 생김
+# ids=1,2,3 처럼 id를 한 번에 넘기면 WHERE 기본키 = ANY(:ids) 쿼리 한 번으로 모두 조회함
+# 결과는 요청한 id 순서대로 items에 담고, 조회되지 않은 id는 404 대신 missing으로 따로 알려줌
+# 예) {"items" : [{"student_id" : 3, ...}, {"student_id" : 1, ...}], "missing" : [2]}
+
+
+def parse_ids(raw : str | None):
+    """콤마로 구분된 id를 정수 튜플로 반환, 없으면 None"""
+    if not raw:
+        return None
+
+    try:
+        ids = tuple(dict.fromkeys(int(value) for value in raw.split(",") if value.strip())) # 중복 제거 + 순서 유지
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids는 콤마로 구분된 정수여야 합니다")
+
+    if not ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids는 콤마로 구분된 정수여야 합니다")
+    if len(ids) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"ids는 한 번에 최대 {MAX_PAGE_SIZE}개까지 조회할 수 있습니다")
+    return ids
+
+
+# db는 IN(ANY) 조건의 순서대로 행을 돌려주지 않기 때문에 기본키로 다시 줄을 세움
+def order_by_ids(rows, ids : tuple, pk_attr : str):
+    by_id = {getattr(row, pk_attr) : row for row in rows}
+    items = [by_id[id] for id in ids if id in by_id]
+    missing = [id for id in ids if id not in by_id]
+    return items, missing
+
+
+@lru_cache(maxsize=64)
+def _batch_adapter(item_type):
+    schema = TypedDict(f"{item_type.__name__}Batch", {"items" : list[item_type], "missing" : list[int]})
+    return TypeAdapter(schema)
+
+
+def render_batch(items, missing : list[int], item_type, response : Response | None = None):
+    """
+    items : item_type 객체(또는 item_type 모양의 dict) 리스트
+    item_type : 응답 모델, 테이블 모델 또는 fieldsets.field_schema로 만든 스키마
+    response : 핸들러에 주입받은 Response, 여기에 설정해둔 헤더(ETag 등)를 그대로 옮겨 담음
+    """
+    content = _batch_adapter(item_type).dump_json({"items" : items, "missing" : missing})
+    result = Response(content=content, media_type="application/json")
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
@@ -0,0 +1,74 @@
+from sqlalchemy import Table
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import os
+
+
+# 대량 추가 -------------------------------------------------------------------------------------------------------------------------------------------------------
+# /post/student는 한 행마다 요청 하나, flush + refresh + commit으로 db 왕복이 3번이라 10만 행을 넣으려면 30만 번 왕복함
+# /post/students/bulk는 리스트 전체를 한 번에 검증하고 BULK_CHUNK_SIZE행씩 여러 행을 담은 INSERT 한 문장으로 넣음
+#   INSERT INTO "Students" (...) VALUES (...), (...), ... ON CONFLICT (name) DO NOTHING RETURNING student_id, name
+# 즉 db 왕복은 청크 수 + commit 한 번이고 RETURNING으로 새 기본키를 받아오기 때문에 refresh도 필요 없음
+#
+# 이름이 이미 있는 행은 ON CONFLICT DO NOTHING으로 건너뛰고 RETURNING에 나오지 않기 때문에 conflict로 알려줌
+# 나머지 행은 그대로 들어가고, 모든 청크를 한 트랜잭션으로 commit하기 때문에 오류가 나면 요청 전체가 들어가지 않음
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000")) # 요청 하나에 담을 수 있는 최대 행 수
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+MAX_BIND_PARAMS = 32767 # asyncpg(postgres 프로토콜)가 한 문장에 담을 수 있는 최대 파라미터 수
+
+
+class BulkReport:
+    """요청 순서대로 항목마다 결과(created, conflict, invalid)를 모음"""
+
+    def __init__(self, size : int):
+        self.items = [None] * size
+
+    def created(self, index : int, id : int):
+        self.items[index] = {"index" : index, "status" : "created", "id" : id}
+
+    def conflict(self, index : int, detail : str):
+        self.items[index] = {"index" : index, "status" : "conflict", "detail" : detail}
+
+    def invalid(self, index : int, detail : str):
+        self.items[index] = {"index" : index, "status" : "invalid", "detail" : detail}
+
+    def pending(self):
+        """아직 결과가 정해지지 않은(db에 넣을) 항목의 위치"""
+        return [index for index, item in enumerate(self.items) if item is None]
+
+    def result(self):
+        counts = {"created" : 0, "conflict" : 0, "invalid" : 0}
+        for item in self.items:
+            counts[item["status"]] += 1
+        return {"created" : counts["created"], "conflicts" : counts["conflict"], "invalid" : counts["invalid"], "items" : self.items}
+
+
+def mark_duplicates(report : BulkReport, keys : list, detail : str):
+    """요청 안에서 unique 칼럼 값이 겹치면 처음 나온 항목만 넣고 나머지는 conflict로 표시"""
+    seen = set()
+    for index in report.pending():
+        if keys[index] in seen:
+            report.conflict(index, detail)
+        else:
+            seen.add(keys[index])
+
+
+async def insert_rows(session : AsyncSession, table : Table, rows : list[dict], unique_column : str, returning):
+    """
+    rows를 청크마다 여러 행 INSERT ... ON CONFLICT (unique_column) DO NOTHING RETURNING 으로 넣고 새로 들어간 행을 반환
+    returning : RETURNING으로 받아올 칼럼들, 새로 들어간 행을 요청 항목과 연결할 수 있도록 unique_column을 포함해야 함
+    세션으로 실행하기 때문에 commit 할 때 조회 결과 캐시(cache.py)의 해당 테이블 결과도 지워짐
+    """
+    if not rows:
+        return []
+    # insert(table).values([...])로 청크를 직접 만들면 sqlalchemy가 청크마다 파라미터 수천 개짜리 문장을 새로 컴파일함(1만 행에 약 3초)
+    # 행 리스트를 파라미터로 넘기면(executemany) 한 행짜리 문장을 한 번만 컴파일해두고(컴파일 캐시)
+    # sqlalchemy의 insertmanyvalues가 insertmanyvalues_page_size행씩 VALUES를 이어 붙인 여러 행 INSERT ... RETURNING으로 보냄
+    statement = (
+        insert(table)
+        .on_conflict_do_nothing(index_elements=[unique_column])
+        .returning(*returning)
+        .execution_options(insertmanyvalues_page_size=max(1, min(BULK_CHUNK_SIZE, MAX_BIND_PARAMS // len(rows[0]))))
+    )
+    return (await session.execute(statement, rows)).all()
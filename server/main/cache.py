@@ -0,0 +1,245 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, date
+from decimal import Decimal
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, ORMExecuteState
+from sqlalchemy.sql.util import find_tables
+
+import os
+import time
+
+
+# 조회 결과 캐시 --------------------------------------------------------------------------------------------------------------------------------------------------
+# 조회 요청이 쓰기 요청보다 훨씬 많기 때문에 같은 쿼리(같은 SQL + 같은 파라미터)의 결과를 워커 메모리에 잠시 저장해두고 db를 거치지 않고 바로 반환함
+# 캐시에 저장된 결과는 쿼리가 읽은 테이블 이름으로 태그를 달아두고
+# 쓰기 세션이 commit 되면 해당 세션에서 변경한 테이블의 태그가 달린 결과를 모두 지움
+#
+# 조회 세션(util.ReadSession)에서 실행한 SELECT만 캐시하고 쓰기 세션(util.get_async_session)은 항상 db에서 직접 조회함
+# 세션 이벤트로 동작하기 때문에 라우터 코드에서는 따로 캐시를 다룰 필요 없음
+#
+# 워커는 각자 자신의 캐시를 가지기 때문에 다른 워커에서 commit된 변경은 TTL이 지나야 보임, 즉 TTL이 워커 간에 허용하는 최대 지연 시간
+# 단 쓰기를 한 클라이언트는 last_write_at 쿠키가 남아있는 동안 캐시를 사용하지 않는 세션으로 조회함(util.get_read_session)
+# 워커 간에도 바로 무효화가 되어야 한다면 CacheBackend를 구현한 공유 캐시(redis 등)를 set_query_cache로 바꿔 끼우면 됨
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024")) # 저장할 최대 쿼리 결과 수, 0이면 캐시를 사용하지 않음
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "5")) # 결과를 저장해둘 시간(초)
+
+CACHE_SESSION_KEY = "query_cache" # 세션의 info에 이 값이 True인 세션에서만 캐시를 사용함
+_PENDING_TAGS_KEY = "query_cache_pending_tags" # commit 전까지 변경된 테이블 이름을 모아두는 곳
+
+
+class CacheBackend(ABC):
+    """
+    캐시 저장소가 구현해야 하는 메서드, 하나라도 구현하지 않으면 인스턴스를 만들 때 TypeError
+    key : 해시 가능한 값, value : sqlalchemy의 FrozenResult, tags : 결과가 읽은 테이블 이름들
+    """
+
+    @abstractmethod
+    def get(self, key): ...
+
+    @abstractmethod
+    def set(self, key, value, tags : frozenset[str]): ...
+
+    @abstractmethod
+    def invalidate(self, tags): ...
+
+    @abstractmethod
+    def clear(self): ...
+
+    @abstractmethod
+    def stats(self) -> dict: ...
+
+
+class MemoryCache(CacheBackend):
+    """
+    워커 메모리에 저장하는 기본 캐시
+    max_entries를 넘으면 가장 오래 사용하지 않은 결과부터 지우고(LRU), ttl이 지난 결과는 조회할 때 지움
+    """
+
+    def __init__(self, max_entries : int, ttl : float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries : OrderedDict = OrderedDict() # key : (만료 시각, value, tags)
+        self._tag_index : dict[str, set] = {} # tag : 해당 태그가 달린 key들
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, tags : frozenset[str]):
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, tags):
+        for tag in tags:
+            for key in self._tag_index.pop(tag, set()):
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._tag_index.clear()
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend" : "memory",
+            "max_entries" : self.max_entries,
+            "ttl" : self.ttl,
+            "entries" : len(self._entries),
+            "hits" : self.hits,
+            "misses" : self.misses,
+            "hit_ratio" : round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions" : self.evictions, # 크기 제한 때문에 지워진 수
+            "expirations" : self.expirations, # ttl이 지나서 지워진 수
+            "invalidations" : self.invalidations # 쓰기 때문에 지워진 수
+        }
+
+
+query_cache : CacheBackend | None = MemoryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL) if QUERY_CACHE_SIZE > 0 else None
+
+
+def set_query_cache(backend : CacheBackend | None):
+    global query_cache
+    query_cache = backend
+
+
+def get_cache_stats():
+    if query_cache is None:
+        return {"backend" : None}
+    return {"pid" : os.getpid(), **query_cache.stats()}
+
+
+def invalidate_tables(*tables : str):
+    """세션을 거치지 않고 db를 직접 변경한 경우(COPY 등) 변경한 테이블의 캐시를 지우기 위해 사용"""
+    if query_cache is not None:
+        query_cache.invalidate(tables)
+
+
+
+# 캐시 key, 태그 만들기 ----------------------------------------------------------------------------------------------------------------------------------------------
+
+# 파라미터로 리스트(ids 등)가 넘어오는 경우가 있어서 해시 가능한 값으로 바꿈
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if value is None or isinstance(value, (str, int, float, bool, datetime, date, Decimal)):
+        return value
+    raise TypeError(f"cannot cache parameter of type {type(value).__name__}")
+
+
+# SQL 문자열을 매번 컴파일하지 않고 sqlalchemy가 컴파일 캐시에 사용하는 구조 key를 그대로 사용함
+# 구조 key에는 SQL 모양(+ selectinload 같은 옵션)만 들어있기 때문에 쿼리 안에 들어간 값과 실행할 때 넘긴 params를 함께 key로 사용함
+# 복제본마다 반영된 시점이 다르기 때문에 어느 엔진(primary, 복제본)에서 읽은 결과인지도 key에 포함함
+def _cache_key(state : ORMExecuteState):
+    statement_key = state.statement._generate_cache_key()
+    if statement_key is None: # 캐시 key를 만들 수 없는 쿼리(text 등)
+        return None
+    values = tuple(_freeze(bind.effective_value) for bind in statement_key.bindparams)
+    return (state.session.get_bind(), statement_key.key, values, _freeze(dict(state.parameters or {})))
+
+
+# 쿼리가 읽는 테이블, selectinload로 함께 불러오는 관계 테이블까지 포함함
+def _statement_tags(statement):
+    tags = {table.name for table in find_tables(statement, check_columns=True) if table is not None}
+    for option in getattr(statement, "_with_options", ()):
+        for element in getattr(option, "context", ()):
+            for entity in element.path:
+                mapper = getattr(entity, "mapper", None)
+                if mapper is not None:
+                    tags.add(mapper.local_table.name)
+    return frozenset(tags)
+
+
+
+# 세션 이벤트 ----------------------------------------------------------------------------------------------------------------------------------------------------
+
+@event.listens_for(Session, "do_orm_execute")
+def _cache_select(state : ORMExecuteState):
+    session = state.session
+
+    # orm을 거치지 않고 실행한 insert, update, delete도 commit 시점에 무효화
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if table is not None:
+            session.info.setdefault(_PENDING_TAGS_KEY, set()).add(table.name)
+        return None
+
+    # 관계 로딩(selectinload의 두 번째 쿼리 등)은 부모 쿼리의 결과와 함께 저장되기 때문에 따로 저장하지 않음
+    if query_cache is None or not session.info.get(CACHE_SESSION_KEY) or not state.is_select or state.is_relationship_load:
+        return None
+
+    try:
+        key = _cache_key(state)
+    except TypeError:
+        key = None
+    if key is None:
+        return None
+
+    frozen = query_cache.get(key)
+    if frozen is None:
+        # freeze는 결과를 모두 읽어서 저장하기 때문에 selectinload의 관계 데이터도 이 때 모두 불러와짐
+        frozen = state.invoke_statement().freeze()
+        query_cache.set(key, frozen, _statement_tags(state.statement))
+    # 캐시에서 꺼낸 orm 객체는 세션에 연결되지 않은 상태로 여러 요청이 함께 읽음, 조회 응답을 만드는 용도로만 사용해야 함
+    return frozen()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_tables(session, flush_context):
+    tags = session.info.setdefault(_PENDING_TAGS_KEY, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tags.add(inspect(obj).mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_tables(session):
+    tags = session.info.pop(_PENDING_TAGS_KEY, None)
+    if tags:
+        invalidate_tables(*tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_tables(session):
+    session.info.pop(_PENDING_TAGS_KEY, None)
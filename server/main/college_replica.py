@@ -0,0 +1,180 @@
+from bisect import bisect_right
+
+import asyncpg
+from sqlalchemy.engine import URL
+
+from models import College
+from cache import invalidate_tables
+
+import json
+import time
+import asyncio
+
+
+# 워커마다 Colleges 테이블 전체를 메모리에 들고 있는 사본 ----------------------------------------------------------------------------------------------------------
+# Colleges는 행이 적고 거의 바뀌지 않지만 단과대 조회, 학생 추가 시 college_id 확인 등으로 계속 읽히기 때문에
+# 워커가 시작될 때 테이블 전체를 불러와서 college_id, college_name으로 찾을 수 있도록 들고 있음
+#
+# 변경 사항은 postgres의 LISTEN/NOTIFY로 받아옴
+# Colleges에 걸어둔 트리거(schema.py의 3번 마이그레이션)가 commit 될 때마다 변경된 행을 colleges_changed 채널로 알리고
+# 각 워커는 전용 연결 하나로 해당 채널을 LISTEN 하다가 알림에 담긴 행으로 사본을 바로 갱신함
+# 따라서 어느 워커에서 수정하든 모든 워커의 사본이 수 ms 안에 같아짐
+#
+# LISTEN 연결이 끊기면 ready가 False가 되고 다시 연결해서 전체를 새로 불러올 때까지 조회 라우터는 db에서 직접 조회함
+COLLEGES_CHANNEL = "colleges_changed"
+RECONNECT_DELAY = 1.0 # LISTEN 연결이 끊겼을 때 다시 연결하기 전 기다리는 시간(초)
+START_TIMEOUT = 5.0 # 서버가 시작될 때 첫 로딩을 기다리는 최대 시간(초), 넘으면 db 조회로 시작하고 로딩은 계속 시도함
+
+
+class CollegeReplica:
+
+    def __init__(self):
+        self.by_id : dict[int, College.CollegeTable] = {}
+        self.by_name : dict[str, College.CollegeTable] = {}
+        self._ordered_ids : list[int] | None = None # college_id 순으로 정렬한 id, 변경되면 다시 만듦
+
+        self.ready = False
+        self._buffer : list[dict] | None = None # 전체를 불러오는 동안 도착한 알림
+        self._task : asyncio.Task | None = None
+        self._loaded = asyncio.Event()
+
+        self.loaded_at : float | None = None
+        self.reloads = 0
+        self.notifications = 0
+
+
+    # 조회 --------------------------------------------------------------------------------------------------------------------------------------------------------
+
+    def get(self, college_id : int):
+        return self.by_id.get(college_id)
+
+    def get_by_name(self, college_name : str):
+        return self.by_name.get(college_name)
+
+    def ordered_ids(self):
+        if self._ordered_ids is None:
+            self._ordered_ids = sorted(self.by_id)
+        return self._ordered_ids
+
+    def page(self, offset : int = 0, limit : int = 10, after : int | None = None):
+        """db의 COLLEGE_RANGE, COLLEGE_AFTER와 같은 결과를 반환"""
+        ids = self.ordered_ids()
+        start = bisect_right(ids, after) if after is not None else offset
+        return [self.by_id[college_id] for college_id in ids[start:start + limit]]
+
+
+    # 갱신 --------------------------------------------------------------------------------------------------------------------------------------------------------
+
+    def upsert(self, row):
+        """row : Colleges 행의 dict 또는 CollegeTable 객체"""
+        if not isinstance(row, dict): # orm 객체를 그대로 검증하면 관계 속성(students)까지 불러오려고 하기 때문에 칼럼 값만 꺼냄
+            row = row.model_dump()
+        college = College.CollegeTable.model_validate(row)
+        previous = self.by_id.get(college.college_id)
+        if previous is not None and previous.college_name != college.college_name:
+            self.by_name.pop(previous.college_name, None)
+
+        self.by_id[college.college_id] = college
+        self.by_name[college.college_name] = college
+        if previous is None:
+            self._ordered_ids = None
+
+    def remove(self, college_id : int):
+        college = self.by_id.pop(college_id, None)
+        if college is not None:
+            self.by_name.pop(college.college_name, None)
+            self._ordered_ids = None
+
+    def _replace_all(self, rows):
+        colleges = [College.CollegeTable.model_validate(row) for row in rows]
+        self.by_id = {college.college_id : college for college in colleges}
+        self.by_name = {college.college_name : college for college in colleges}
+        self._ordered_ids = None
+
+    def _apply(self, message : dict):
+        op = message["op"]
+        if op == "TRUNCATE":
+            self._replace_all([])
+        elif op == "DELETE":
+            self.remove(message["row"]["college_id"])
+        else:
+            self.upsert(message["row"])
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self.notifications += 1
+        message = json.loads(payload)
+        if self._buffer is not None: # 전체를 불러오는 중이면 불러온 뒤에 순서대로 적용
+            self._buffer.append(message)
+        else:
+            self._apply(message)
+
+        # 다른 워커에서 바뀐 Colleges도 이 워커의 조회 결과 캐시(include=students 등)에 반영되도록 함
+        invalidate_tables(College.CollegeTable.__tablename__)
+
+
+    # LISTEN 연결 -------------------------------------------------------------------------------------------------------------------------------------------------
+
+    async def _listen(self, dsn : str):
+        connection = await asyncpg.connect(dsn) # 풀 밖의 전용 연결, util.LISTEN_CONNECTIONS로 워커당 연결 수에서 미리 빼둠
+        closed = asyncio.Event()
+        connection.add_termination_listener(lambda _ : closed.set())
+        try:
+            # LISTEN을 먼저 하고 전체를 불러와야 그 사이에 commit된 변경을 놓치지 않음
+            self._buffer = []
+            await connection.add_listener(COLLEGES_CHANNEL, self._on_notify)
+            rows = await connection.fetch(f'SELECT * FROM "{College.CollegeTable.__tablename__}"')
+            self._replace_all(dict(row) for row in rows)
+            buffered, self._buffer = self._buffer, None
+            for message in buffered:
+                self._apply(message)
+
+            self.ready = True
+            self.loaded_at = time.time()
+            self.reloads += 1
+            self._loaded.set()
+            await closed.wait()
+        finally:
+            self.ready = False
+            self._buffer = None
+            if not connection.is_closed():
+                await connection.close()
+
+    async def _run(self, dsn : str):
+        while True:
+            try:
+                await self._listen(dsn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f">>>>> College replica error <<<<< \n {str(e)}")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def start(self, url : URL):
+        """url : 엔진의 url, asyncpg에 직접 연결하기 위해 드라이버 이름을 뗌"""
+        dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self._task = asyncio.create_task(self._run(dsn))
+        try:
+            await asyncio.wait_for(self._loaded.wait(), START_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(">>>>> College replica is not ready, falling back to the database <<<<<")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "ready" : self.ready,
+            "colleges" : len(self.by_id),
+            "loaded_at" : self.loaded_at,
+            "reloads" : self.reloads,
+            "notifications" : self.notifications
+        }
+
+
+colleges = CollegeReplica()
@@ -0,0 +1,64 @@
+from sqlmodel import select
+from sqlalchemy import func, literal_column
+from sqlalchemy.sql.expression import Executable, ClauseElement
+from sqlalchemy.ext.compiler import compiles
+
+import json
+
+
+# 목록 조회의 전체 개수 ---------------------------------------------------------------------------------------------------------------------------------------------
+# count=exact : 페이지를 조회하는 쿼리에 COUNT(*) 스칼라 서브쿼리를 칼럼으로 붙여서 같은 db 왕복 안에서 전체 개수를 함께 받아옴
+#               조건에 맞는 행을 모두 세야 하기 때문에 조건에 맞는 행이 많을수록 느려짐
+# count=estimated : 쿼리를 실행하지 않고 EXPLAIN으로 postgres 플래너가 통계(pg_class.reltuples, pg_statistic)로 예상한 행 수를 가져옴
+#                   ANALYZE 시점의 통계이기 때문에 정확하지 않지만 테이블 크기와 상관없이 빠름
+# count=none : 개수를 세지 않음(기본값)
+#
+# 개수는 응답 본문의 모양을 바꾸지 않도록 X-Total-Count 헤더로, 어떤 방식으로 센 값인지는 X-Total-Count-Type 헤더로 반환함
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_COUNT_TYPE_HEADER = "X-Total-Count-Type"
+TOTAL_COUNT_LABEL = "total_count"
+
+
+def with_exact_count(statement, table, conditions):
+    """
+    statement에 조건에 맞는 전체 행 수를 칼럼으로 추가함
+    윈도우 함수(COUNT(*) OVER ())는 커서 조건(WHERE 정렬 키 > 마지막 값)까지 적용된 행만 세기 때문에
+    커서, offset과 상관없는 별도의 서브쿼리로 셈, 상관 관계가 없는 서브쿼리라서 postgres는 한 번만 실행함(InitPlan)
+    """
+    total = select(func.count()).select_from(table).where(*conditions).scalar_subquery()
+    return statement.add_columns(total.label(TOTAL_COUNT_LABEL))
+
+
+def split_exact_count(rows, entity : bool):
+    """
+    with_exact_count로 조회한 행에서 전체 개수를 떼어냄
+    entity : orm 객체를 조회한 경우 True, 이 때 각 행은 (orm 객체, 개수)이기 때문에 orm 객체만 꺼냄
+    """
+    total = getattr(rows[0], TOTAL_COUNT_LABEL) if rows else 0
+    results = [row[0] for row in rows] if entity else rows
+    return results, total
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def estimate_count(session, table, conditions):
+    statement = select(literal_column("1")).select_from(table).where(*conditions)
+    plan = (await session.execute(Explain(statement))).scalar_one()
+    if isinstance(plan, str): # asyncpg는 json 타입을 문자열로 반환함
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def set_total_count(response, total : int, count_type : str):
+    response.headers[TOTAL_COUNT_HEADER] = str(total)
+    response.headers[TOTAL_COUNT_TYPE_HEADER] = count_type
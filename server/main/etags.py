@@ -0,0 +1,60 @@
+from fastapi import Request, Response, status
+
+import hashlib
+
+
+# 조건부 GET ------------------------------------------------------------------------------------------------------------------------------------------------------
+# 조회 응답마다 (조회된 행의 기본키, 버전)으로 만든 ETag를 헤더로 보내고
+# 클라이언트가 다음 요청에 If-None-Match로 그 값을 다시 보내면 내용이 바뀌지 않은 경우 본문 없이 304를 반환함
+# 같은 페이지를 주기적으로 다시 조회하는 클라이언트는 바뀐 것이 없으면 응답 직렬화와 본문 전송을 모두 건너뜀
+#
+# 행의 버전(version 칼럼)은 수정될 때마다 올라가기 때문에 버전이 같으면 행의 내용도 같음
+# 같은 행이라도 fields, include에 따라 응답 모양이 달라지기 때문에 요청 경로와 쿼리 문자열도 함께 해시함
+
+
+def row_versions(rows, pk_attr : str, relation : str | None = None, relation_pk : str | None = None):
+    """
+    rows : orm 객체 또는 Row 리스트
+    relation : include로 함께 불러온 관계 속성 이름, 관계 데이터의 버전도 ETag에 포함함
+    """
+    versions = []
+    for row in rows:
+        entry = (getattr(row, pk_attr), row.version)
+        if relation is not None:
+            related = getattr(row, relation)
+            if isinstance(related, list):
+                entry += (tuple((getattr(item, relation_pk), item.version) for item in related),)
+            elif related is not None:
+                entry += ((getattr(related, relation_pk), related.version),)
+        versions.append(entry)
+    return versions
+
+
+def make_etag(request : Request, versions) -> str:
+    query = sorted(request.query_params.multi_items()) # 쿼리 순서만 다른 요청(singleflight.py에서 합쳐지는 요청)은 같은 ETag를 가지도록 정렬함
+    digest = hashlib.blake2b(repr((request.url.path, query, versions)).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def _matches(request : Request, etag : str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match는 약한 비교를 하기 때문에 W/를 떼고 비교함
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def check_etag(request : Request, response : Response, etag : str):
+    """
+    응답에 ETag 헤더를 설정하고, 클라이언트가 가진 버전과 같다면 304 응답을 반환함(다르면 None)
+    304 응답에도 ETag, X-Next-Cursor 등 response에 설정해둔 헤더를 그대로 담음
+    """
+    response.headers["ETag"] = etag
+    if not _matches(request, etag):
+        return None
+
+    not_modified = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    not_modified.headers.raw.extend(response.headers.raw)
+    return not_modified
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from fieldsets import field_values, dump_json
+
+import io
+import os
+import csv
+
+
+# 전체 내보내기(export) -------------------------------------------------------------------------------------------------------------------------------------------
+# 조회 결과 전체를 리스트로 만들지 않고 server-side cursor로 EXPORT_BATCH_SIZE개씩 가져와서 바로 응답으로 흘려보냄
+# 한 번에 메모리에 올라가는 행은 배치 하나뿐이기 때문에 테이블 크기와 상관없이 메모리 사용량이 일정함
+#
+# StreamingResponse는 핸들러가 반환된 뒤에 본문을 만들기 때문에 핸들러에 주입받은 세션은 이미 닫혀 있음
+# 따라서 제너레이터 안에서 직접 연결을 열고 내보내기가 끝나면(또는 클라이언트가 끊으면) 반납함
+# 내보내는 동안 연결 하나를 계속 사용하기 때문에 동시에 여러 개를 내보내면 그만큼 풀의 연결이 줄어듦
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+
+# nginx는 기본적으로 upstream의 응답을 버퍼에 모았다가 보내기 때문에 이 헤더로 해당 응답만 버퍼링을 끔
+EXPORT_HEADERS = {"X-Accel-Buffering" : "no", "Cache-Control" : "no-store"}
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson" : "application/x-ndjson",
+    "csv" : "text/csv; charset=utf-8",
+}
+
+
+async def _stream_rows(engine : AsyncEngine, statement):
+    async with engine.connect() as conn:
+        # yield_per로 지정한 개수만큼씩 cursor에서 가져옴, asyncpg는 트랜잭션 안에서만 cursor를 열 수 있어서 connect가 자동으로 트랜잭션을 시작함
+        result = await conn.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield rows
+
+
+async def stream_ndjson(engine : AsyncEngine, statement, model, fields : tuple):
+    """한 줄에 한 행씩 json으로 내보냄"""
+    try:
+        async for rows in _stream_rows(engine, statement):
+            yield b"".join(dump_json(field_values(row, fields), newline=True) for row in rows)
+    except Exception as e:
+        # 이미 200으로 응답을 보내기 시작했기 때문에 상태 코드를 바꿀 수 없음, 로그만 남기고 응답을 끝냄
+        print(f">>>>> Export Error <<<<< \n {str(e)}")
+        raise
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def stream_csv(engine : AsyncEngine, statement, model, fields : tuple):
+    """첫 줄은 칼럼 이름, 이후 한 줄에 한 행씩 내보냄"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue().encode()
+
+    try:
+        async for rows in _stream_rows(engine, statement):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_csv_value(getattr(row, field)) for field in fields] for row in rows)
+            yield buffer.getvalue().encode()
+    except Exception as e:
+        print(f">>>>> Export Error <<<<< \n {str(e)}")
+        raise
+
+
+EXPORT_WRITERS = {
+    "ndjson" : stream_ndjson,
+    "csv" : stream_csv,
+}
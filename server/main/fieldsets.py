@@ -0,0 +1,114 @@
+from functools import lru_cache
+from typing_extensions import TypedDict # python 3.11에서는 pydantic이 typing_extensions의 TypedDict만 지원함
+
+from decimal import Decimal
+
+from pydantic import TypeAdapter
+from fastapi import HTTPException, Response, status
+from sqlalchemy.engine import Row
+
+import os
+import orjson
+
+
+# fields=student_id,name 처럼 클라이언트가 필요한 칼럼만 요청하면
+# SQL에서도 해당 칼럼만 조회하고(select student_id, name ...) 응답 스키마도 해당 칼럼만 가지도록 줄임
+# 전체 orm 객체를 만들고 response_model로 모든 칼럼을 검증, 직렬화하는 비용을 요청한 칼럼만큼으로 줄이기 위함
+#
+# 응답 직렬화 fast path : FAST_RESPONSE_PATH=1이면 fields, include를 주지 않은 조회 요청도 전체 칼럼을 fields로 요청한 것처럼 처리함
+# orm 객체를 만들지 않고(1000행 기준 행당 약 10.6µs -> 4.3µs) response_model 검증과 jsonable_encoder도 거치지 않고
+# 조회된 행(tuple)을 바로 dict로 만들어서 orjson으로 직렬화함(행당 약 2.8µs -> 1.0µs), 응답 본문은 키 순서가 모델에 선언한 순서인 것만 다름
+# 측정 스크립트와 결과는 server/bench/serialize.py, server/bench/README.md 참고
+# 조회 결과 캐시에는 orm 객체 대신 행이 저장되기 때문에 캐시가 차지하는 메모리도 줄어듦
+FAST_RESPONSE_PATH = os.getenv("FAST_RESPONSE_PATH", "0") == "1"
+
+
+def parse_fields(raw : str | None, model):
+    """콤마로 구분된 필드 이름을 검사해서 튜플로 반환, 없으면 None (= 전체 필드)"""
+    if not raw:
+        return None
+
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(",") if field.strip())) # 중복 제거 + 순서 유지
+    unknown = [field for field in fields if field not in model.model_fields]
+    if not fields or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"조회할 수 없는 필드입니다: {', '.join(unknown)}. 사용 가능한 필드: {', '.join(model.model_fields)}"
+        )
+    return fields
+
+
+def default_fields(model, fields : tuple | None, include):
+    """fields, include가 없는 요청에 FAST_RESPONSE_PATH가 켜져 있다면 전체 필드를 반환, 아니라면 fields를 그대로 반환"""
+    if fields or include or not FAST_RESPONSE_PATH:
+        return fields
+    return tuple(model.model_fields)
+
+
+# SQL로 조회할 칼럼, 응답에는 포함하지 않더라도 커서를 만들기 위한 기본키, 정렬 칼럼 등은 required로 넘겨서 같이 조회함
+def select_columns(model, fields : tuple, *required : str):
+    return [getattr(model, field) for field in dict.fromkeys((*fields, *required))]
+
+
+# 필드 조합마다 응답 스키마(TypedDict)를 만들어서 캐싱해둠, ids 일괄 조회 응답(batch.py)의 items 스키마로 사용함
+@lru_cache(maxsize=256)
+def field_schema(model, fields : tuple):
+    return TypedDict(f"{model.__name__}Fields", {field : model.model_fields[field].annotation for field in fields})
+
+
+def field_values(row, fields : tuple):
+    """
+    row : select_columns로 조회한 Row 또는 orm 객체
+    select_columns는 항상 fields를 앞쪽에 두기 때문에 Row는 이름으로 찾지 않고 앞에서부터 순서대로 짝지음(getattr보다 약 4배 빠름)
+    """
+    if isinstance(row, Row):
+        return dict(zip(fields, row))
+    return {field : getattr(row, field) for field in fields}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal): # pydantic과 같이 문자열로 직렬화
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dump_json(content, newline : bool = False):
+    """
+    값은 이미 DB 타입대로 조회된 것이기 때문에 스키마 없이 orjson으로 바로 직렬화함
+    int, str, datetime 등 테이블 칼럼 타입은 pydantic(response_model)과 같은 모양으로 직렬화됨
+    """
+    return orjson.dumps(content, default=_json_default, option=orjson.OPT_APPEND_NEWLINE if newline else 0)
+
+
+def render_fields(rows, model, fields : tuple, response : Response | None = None):
+    """
+    rows : 조회된 Row 리스트 또는 Row 하나
+    response : 핸들러에 주입받은 Response, 여기에 설정해둔 헤더(X-Next-Cursor 등)를 그대로 옮겨 담음
+    """
+    many = isinstance(rows, list)
+    if many:
+        content = [field_values(row, fields) for row in rows]
+    else:
+        content = field_values(rows, fields)
+
+    result = Response(content=dump_json(content), media_type="application/json")
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
+
+
+@lru_cache(maxsize=32)
+def _model_adapter(model, many : bool):
+    return TypeAdapter(list[model] if many else model)
+
+
+def render_models(items, model, response : Response | None = None):
+    """
+    response_model과 다른 모양(예: 관계 데이터를 포함한 응답)으로 반환해야 할 때 사용
+    items : model 객체 리스트 또는 model 객체 하나
+    """
+    many = isinstance(items, list)
+    result = Response(content=_model_adapter(model, many).dump_json(items), media_type="application/json")
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
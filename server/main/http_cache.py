@@ -0,0 +1,73 @@
+from fastapi import Request, Response
+
+from util import LAST_WRITE_COOKIE, READ_YOUR_WRITES_WINDOW
+
+import os
+import time
+
+
+# nginx 마이크로 캐시용 응답 헤더 ---------------------------------------------------------------------------------------------------------------------------------
+# nginx.conf의 /main_server/get/ location은 조회 응답을 아주 짧게(MICRO_CACHE_TTL초) 저장해두고 같은 요청에 fastapi를 거치지 않고 바로 응답함
+# 인기 있는 페이지에 요청이 몰려도 nginx가 1초에 한 번 정도만 fastapi로 요청을 보냄(proxy_cache_lock으로 캐시가 빈 순간의 요청도 하나로 합침)
+# 얼마나 저장할지는 nginx 설정이 아니라 앱이 Cache-Control로 정함
+#   조회 : public, max-age=0, s-maxage=TTL, stale-while-revalidate=STALE
+#          브라우저(max-age=0)는 매번 ETag로 다시 확인하고, 공유 캐시(nginx, CDN)만 TTL초 동안 저장함
+#          TTL이 지나면 STALE초 동안은 이전 응답을 바로 보내면서 뒤에서 새로 받아옴(proxy_cache_background_update)
+#   쓰기 : no-store, 쓰기를 한 클라이언트에는 last_write_at 쿠키를 남겨서 nginx가 잠시 캐시를 거치지 않도록 함(read-your-writes)
+#
+# 오픈소스 nginx에는 키 단위로 캐시를 지우는 기능(proxy_cache_purge)이 없기 때문에 다른 클라이언트는 최대 TTL초 동안 쓰기 전의 응답을 볼 수 있음
+# 대신 모든 응답에 Surrogate-Key 헤더로 어떤 데이터로 만든 응답인지(테이블, 행) 표시하고 쓰기 응답에는 바뀐 데이터의 키를 담아서
+# 키 단위 삭제를 지원하는 캐시(Varnish xkey, Fastly, nginx 상용 버전 등)를 앞에 두면 쓰기 응답의 키로 해당 응답만 지울 수 있도록 함
+#   GET /get/student/5?include=college -> Surrogate-Key: students student-5 colleges
+#   PUT /put/student/5                 -> Surrogate-Key: students student-5
+MICRO_CACHE_TTL = int(os.getenv("MICRO_CACHE_TTL", "1")) # 0이면 공유 캐시에 저장하지 않음(no-cache)
+MICRO_CACHE_STALE = int(os.getenv("MICRO_CACHE_STALE", "10"))
+SURROGATE_KEY_HEADER = "Surrogate-Key"
+
+# 경로의 두 번째 부분(/get/student/... 의 student)과 include 값 -> 키
+RESOURCE_KEYS = {"college" : "colleges", "colleges" : "colleges", "student" : "students", "students" : "students", "stats" : "stats"}
+# 통계는 source=live면 Students, Colleges를 직접 집계하기 때문에 두 테이블이 바뀌면 함께 지워야 함
+LIVE_STATS_KEYS = ("students", "colleges")
+
+
+def surrogate_keys(request : Request):
+    """라우트 경로와 경로 파라미터, include로 응답을 만든 데이터의 키 목록을 만듦"""
+    route = request.scope.get("route")
+    parts = (route.path if route is not None else request.url.path).strip("/").split("/")
+    resource = RESOURCE_KEYS.get(parts[1]) if len(parts) > 1 else None
+    if resource is None:
+        return []
+
+    keys = [resource]
+    for name, value in request.path_params.items():
+        keys.append(f"{name.removesuffix('_id')}-{value}") # student_id=5 -> student-5
+    if resource == "stats" and request.method == "GET" and request.query_params.get("source", "live") == "live":
+        keys.extend(LIVE_STATS_KEYS)
+    related = RESOURCE_KEYS.get(request.query_params.get("include", ""))
+    if related is not None and related not in keys:
+        keys.append(related)
+    return keys
+
+
+def cache_headers(request : Request, response : Response):
+    """
+    라우터 의존성(APIRouter(dependencies=...))으로 사용, 요청 메소드에 따라 조회/쓰기 응답 헤더를 설정함
+    핸들러가 Response를 직접 만들어서 반환하는 경우(render_fields, check_etag 등)도 response의 헤더를 복사하기 때문에 같은 헤더가 붙음
+    스트리밍 응답(export)은 EXPORT_HEADERS의 no-store를 그대로 사용함
+    """
+    keys = surrogate_keys(request)
+    if keys:
+        response.headers[SURROGATE_KEY_HEADER] = " ".join(keys)
+
+    if request.method in ("GET", "HEAD"):
+        if MICRO_CACHE_TTL > 0:
+            response.headers["Cache-Control"] = f"public, max-age=0, s-maxage={MICRO_CACHE_TTL}, stale-while-revalidate={MICRO_CACHE_STALE}"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return
+
+    response.headers["Cache-Control"] = "no-store"
+    # 복제본 지연, 조회 결과 캐시(READ_YOUR_WRITES_WINDOW)와 nginx에 남아있을 수 있는 이전 응답(TTL + STALE) 중 긴 시간 동안
+    # 이 클라이언트의 조회는 nginx 캐시, single-flight, 조회 결과 캐시를 거치지 않고 primary에서 읽음
+    window = max(READ_YOUR_WRITES_WINDOW, MICRO_CACHE_TTL + MICRO_CACHE_STALE)
+    response.set_cookie(LAST_WRITE_COOKIE, str(time.time()), max_age=int(window) + 1, httponly=True)
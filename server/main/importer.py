@@ -0,0 +1,260 @@
+from datetime import datetime
+
+import orjson
+from pydantic import ValidationError
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from models import Student, Import
+from cache import invalidate_tables
+from autocomplete import student_names
+
+import os
+import csv
+
+
+# 학생 명단 가져오기(COPY) ---------------------------------------------------------------------------------------------------------------------------------------
+# 학기 초 명단처럼 수십만 행을 넣을 때 사용, /post/students/bulk와 달리 본문 전체를 리스트로 받아서 검증하지 않고
+# 업로드되는 본문을 줄 단위로 읽으면서 한 행씩 검증하고 IMPORT_BATCH_SIZE행씩 COPY로 임시 테이블(staging)에 보냄
+# 메모리에는 COPY로 보내기 전의 한 배치만 들고 있기 때문에 본문 크기와 상관없이 메모리 사용량이 일정함
+#
+# 본문을 다 받으면 staging에서 Students로 한 번에 옮김(merge)
+#   1. 파일 안에서 이름이 겹치는 행은 처음 나온 행만 남김
+#   2. 존재하지 않는 단과대학을 가리키는 행을 지움(외래키 오류로 전체가 실패하지 않도록)
+#   3. INSERT INTO "Students" SELECT ... FROM staging ON CONFLICT (name) DO NOTHING | DO UPDATE
+#      이미 있는 이름은 on_conflict=skip이면 건너뛰고 update면 나이, 전공, 단과대학을 덮어쓰고 version을 올림(ETag가 바뀜)
+# 모든 과정이 한 트랜잭션이기 때문에 중간에 실패하면 아무것도 들어가지 않고 staging은 commit/rollback 때 사라짐(ON COMMIT DROP)
+#
+# 진행 상황은 배치마다 StudentImports 테이블에 따로 commit 하기 때문에 다른 요청(다른 워커)에서 GET /get/student/import/{import_id}로 조회할 수 있음
+# 대량으로 넣은 뒤에는 autovacuum이 통계를 갱신하기 전까지 planner가 예전 행 수로 실행 계획을 세우기 때문에 바로 ANALYZE를 실행함
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "10000")) # 이만큼 읽을 때마다 COPY로 보내고 진행 상황을 기록함
+IMPORT_ANALYZE_MIN_ROWS = int(os.getenv("IMPORT_ANALYZE_MIN_ROWS", "10000")) # 이만큼 이상 넣거나 바꿨으면 ANALYZE 실행
+IMPORT_MAX_ERRORS = 100 # 진행 상황에 기록할 버린 행의 최대 개수
+
+IMPORT_MEDIA_TYPES = {
+    "ndjson" : "application/x-ndjson",
+    "csv" : "text/csv",
+}
+CSV_COLUMNS = ("name", "age", "major", "college_id")
+CSV_REQUIRED_COLUMNS = ("name", "age")
+
+STAGING_TABLE = "student_import_staging"
+STAGING_COLUMNS = ("line", "name", "age", "major", "college_id")
+
+# 같은 이름 중 줄 번호가 가장 작은 행만 남김
+DELETE_DUPLICATES = text(
+    f"DELETE FROM {STAGING_TABLE} a USING {STAGING_TABLE} b "
+    "WHERE a.name = b.name AND a.line > b.line RETURNING a.line"
+)
+DELETE_UNKNOWN_COLLEGES = text(
+    f"DELETE FROM {STAGING_TABLE} s WHERE s.college_id IS NOT NULL "
+    'AND NOT EXISTS (SELECT 1 FROM "Colleges" c WHERE c.college_id = s.college_id) RETURNING s.line'
+)
+# update인 경우 값이 같은 행은 version을 올리지 않도록 바뀐 행만 덮어씀(덮어쓰지 않은 행은 RETURNING에 나오지 않아 skipped로 셈)
+MERGE_ACTIONS = {
+    "skip" : "DO NOTHING",
+    "update" : (
+        'DO UPDATE SET age = EXCLUDED.age, major = EXCLUDED.major, college_id = EXCLUDED.college_id, version = "Students".version + 1 '
+        'WHERE ("Students".age, "Students".major, "Students".college_id) IS DISTINCT FROM (EXCLUDED.age, EXCLUDED.major, EXCLUDED.college_id)'
+    ),
+}
+
+
+def merge_statement(on_conflict : str):
+    # xmax = 0 : 이번에 새로 들어간 행, 아니면 이미 있던 행을 덮어쓴 것
+    return text(
+        'INSERT INTO "Students" (name, age, major, college_id, added_at, version) '
+        f"SELECT name, age, major, college_id, :added_at, 1 FROM {STAGING_TABLE} ORDER BY line "
+        f"ON CONFLICT (name) {MERGE_ACTIONS[on_conflict]} "
+        "RETURNING student_id, name, (xmax = 0) AS inserted"
+    )
+
+
+# 본문 읽기 ------------------------------------------------------------------------------------------------------------------------------------------------------
+
+async def _lines(stream):
+    """요청 본문 조각을 줄 단위로 나눔, 아직 줄바꿈이 오지 않은 마지막 줄만 들고 있음"""
+    rest = b""
+    async for chunk in stream:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line
+    if rest:
+        yield rest
+
+
+async def read_ndjson(stream):
+    """(줄 번호, dict 또는 오류 메시지)를 반환, 빈 줄은 건너뜀"""
+    line_no = 0
+    async for line in _lines(stream):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_no, orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield line_no, "json 형식이 아닙니다"
+
+
+async def read_csv(stream):
+    """
+    첫 줄은 칼럼 이름(name, age, major, college_id 중 name, age는 필수), 빈 값은 기본값(major)이나 null(college_id)로 넣음
+    줄 단위로 읽기 때문에 따옴표 안에 줄바꿈이 있는 값은 지원하지 않음
+    """
+    header = None
+    line_no = 0
+    async for line in _lines(stream):
+        line_no += 1
+        try:
+            decoded = line.decode("utf-8-sig" if line_no == 1 else "utf-8").rstrip("\r") # 엑셀로 저장한 csv는 앞에 BOM이 붙음
+        except UnicodeDecodeError:
+            yield line_no, "utf-8로 읽을 수 없습니다"
+            continue
+        if not decoded.strip():
+            continue
+        values = next(csv.reader([decoded]))
+
+        if header is None:
+            header = [value.strip() for value in values]
+            unknown = [column for column in header if column not in CSV_COLUMNS]
+            missing = [column for column in CSV_REQUIRED_COLUMNS if column not in header]
+            if unknown or missing or len(set(header)) != len(header):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"csv 첫 줄은 {', '.join(CSV_COLUMNS)} 중 칼럼 이름이어야 하고 {', '.join(CSV_REQUIRED_COLUMNS)}는 필수입니다"
+                )
+            continue
+
+        if len(values) != len(header):
+            yield line_no, f"칼럼 수({len(values)})가 첫 줄의 칼럼 수({len(header)})와 다릅니다"
+            continue
+        yield line_no, {column : value for column, value in zip(header, values) if value != ""}
+
+
+IMPORT_READERS = {
+    "ndjson" : read_ndjson,
+    "csv" : read_csv,
+}
+
+
+# 진행 상황 ------------------------------------------------------------------------------------------------------------------------------------------------------
+
+async def _save(engine : AsyncEngine, progress : dict):
+    # 가져오기 트랜잭션과 다른 연결로 바로 commit 해서 가져오는 도중에도 다른 요청이 볼 수 있도록 함
+    table = Import.StudentImportTable.__table__
+    async with engine.begin() as conn:
+        await conn.execute(update(table).where(table.c.import_id == progress["import_id"]).values(**progress))
+
+
+async def get_progress(engine : AsyncEngine, import_id : int):
+    """조회 결과 캐시를 거치지 않도록 세션 대신 연결로 바로 읽음, 없으면 None"""
+    table = Import.StudentImportTable.__table__
+    async with engine.connect() as conn:
+        row = (await conn.execute(select(table).where(table.c.import_id == import_id))).first()
+    return dict(row._mapping) if row is not None else None
+
+
+def _reject(progress : dict, counter : str, line_no : int, detail : str):
+    progress[counter] += 1
+    if len(progress["errors"]) < IMPORT_MAX_ERRORS:
+        progress["errors"].append({"line" : line_no, "detail" : detail})
+
+
+def _validate(progress : dict, line_no : int, data):
+    """StudentCreate로 검증해서 staging 행(tuple)으로 바꿈, 잘못된 행은 기록하고 None"""
+    if isinstance(data, str):
+        _reject(progress, "rows_invalid", line_no, data)
+        return None
+    try:
+        student = Student.StudentCreate.model_validate(data)
+    except ValidationError as e:
+        error = e.errors(include_url=False)[0]
+        _reject(progress, "rows_invalid", line_no, f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}")
+        return None
+    return (line_no, student.name, student.age, student.major, student.college_id)
+
+
+# 가져오기 -------------------------------------------------------------------------------------------------------------------------------------------------------
+
+async def _copy_and_merge(engine : AsyncEngine, stream, format : str, on_conflict : str, progress : dict):
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            f"CREATE TEMP TABLE {STAGING_TABLE} (line bigint, name text, age integer, major text, college_id integer) ON COMMIT DROP"
+        ))
+        # COPY는 sqlalchemy로 실행할 수 없어서 같은 트랜잭션의 asyncpg 연결로 바로 보냄(copy_records_to_table은 바이너리 COPY FROM STDIN)
+        driver = (await conn.get_raw_connection()).driver_connection
+
+        batch = []
+        staged = 0
+        async for line_no, data in IMPORT_READERS[format](stream):
+            progress["rows_received"] += 1
+            record = _validate(progress, line_no, data)
+            if record is not None:
+                batch.append(record)
+            if progress["rows_received"] % IMPORT_BATCH_SIZE == 0:
+                if batch:
+                    await driver.copy_records_to_table(STAGING_TABLE, records=batch, columns=STAGING_COLUMNS)
+                    staged += len(batch)
+                    batch = []
+                await _save(engine, progress)
+        if batch:
+            await driver.copy_records_to_table(STAGING_TABLE, records=batch, columns=STAGING_COLUMNS)
+            staged += len(batch)
+
+        progress["status"] = "merging"
+        await _save(engine, progress)
+
+        # 임시 테이블은 autovacuum이 통계를 만들지 않기 때문에 merge 쿼리의 실행 계획(해시 조인 등)을 위해 직접 ANALYZE 함
+        await conn.execute(text(f"ANALYZE {STAGING_TABLE}"))
+        for statement, counter, detail in (
+            (DELETE_DUPLICATES, "rows_duplicate", "파일 안에서 중복된 이름입니다"),
+            (DELETE_UNKNOWN_COLLEGES, "rows_unknown_college", "존재하지 않는 단과대학입니다"),
+        ):
+            lines = sorted((await conn.execute(statement)).scalars().all())
+            for line_no in lines:
+                _reject(progress, counter, line_no, detail)
+            staged -= len(lines)
+
+        merged = (await conn.execute(merge_statement(on_conflict), {"added_at" : datetime.now()})).all()
+
+    inserted = [(row.name, row.student_id) for row in merged if row.inserted]
+    progress["rows_inserted"] = len(inserted)
+    progress["rows_updated"] = len(merged) - len(inserted)
+    progress["rows_skipped"] = staged - len(merged)
+    return inserted
+
+
+async def run_import(engine : AsyncEngine, stream, format : str, on_conflict : str):
+    """stream : 요청 본문 조각의 async iterator(request.stream()), 끝난 뒤의 진행 상황을 반환"""
+    table = Import.StudentImportTable.__table__
+    async with engine.begin() as conn:
+        row = (await conn.execute(
+            insert(table).values(format=format, on_conflict=on_conflict, errors=[], started_at=datetime.now()).returning(table)
+        )).one()
+    progress = dict(row._mapping)
+
+    try:
+        inserted = await _copy_and_merge(engine, stream, format, on_conflict, progress)
+    except Exception as e:
+        progress.update(status="failed", error=e.detail if isinstance(e, HTTPException) else str(e), finished_at=datetime.now())
+        await _save(engine, progress)
+        raise
+
+    # merge가 commit 된 뒤에는 행이 이미 들어가 있기 때문에 아래 후속 작업이 실패해도 가져오기는 성공(done)으로 기록함
+    progress.update(status="done", finished_at=datetime.now())
+    await _save(engine, progress)
+
+    try:
+        # 세션을 거치지 않고 바꿨기 때문에 조회 결과 캐시, 자동완성 인덱스는 직접 갱신함
+        invalidate_tables(Student.StudentTable.__tablename__)
+        student_names.add_many(inserted)
+
+        if progress["rows_inserted"] + progress["rows_updated"] >= IMPORT_ANALYZE_MIN_ROWS:
+            async with engine.begin() as conn:
+                await conn.execute(text('ANALYZE "Students"'))
+    except Exception as e: # 캐시는 TTL, 통계는 autovacuum으로 결국 맞춰지기 때문에 기록만 함
+        print(f">>>>> Import housekeeping error <<<<< \n {str(e)}")
+
+    return progress
@@ -0,0 +1,19 @@
+from typing import Literal, Optional
+from sqlmodel import SQLModel
+
+
+# /post/students/bulk, /post/colleges/bulk 응답용 모델
+
+
+class BulkItemResult(SQLModel):
+    index : int # 요청 리스트 안에서의 위치
+    status : Literal["created", "conflict", "invalid"]
+    id : Optional[int] = None # created인 경우 새로 만들어진 기본키
+    detail : Optional[str] = None # conflict, invalid인 경우 이유
+
+
+class BulkInsertResult(SQLModel):
+    created : int
+    conflicts : int
+    invalid : int
+    items : list[BulkItemResult] # 요청 순서와 같음
@@ -2,6 +2,8 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional, List, TYPE_CHECKING
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
+from sqlalchemy.orm import declared_attr
 
 
 # Optional[type] = None 을 하면 nullable
@@ -21,13 +23,33 @@ class CollgeBase(SQLModel): # 요청, 응답, 테이블 구조 등등을 정의
 
 class CollegeTable(CollgeBase, table=True): # DB 수준에서 관리해야 하는 것들이 Table 객체에서 정의
     __tablename__ = "Colleges"
+    # /get/college/search의 부분 문자열, 유사도 검색용 trigram 인덱스 (pg_trgm 확장이 필요함, schema.py에서 설치)
+    __table_args__ = (
+        Index("ix_colleges_college_name_trgm", "college_name", postgresql_using="gin", postgresql_ops={"college_name" : "gin_trgm_ops"}),
+    )
     
     college_id : Optional[int] = Field(default=None, primary_key=True) # autoincrement
     tell_num : Optional[str] = Field(default=None)
+    version : int = Field(default=1, sa_column_kwargs={"server_default" : "1"}) # 수정될 때마다 올라가는 버전, StudentTable.version과 동일
+
+    @declared_attr
+    def __mapper_args__(cls):
+        return {"version_id_col" : cls.__table__.c.version}
 
     students : List["StudentTable"] = Relationship(back_populates="collge") # 객체 수준에서 Collge와 연결된 모든 Student 객체를 리스트 형태로 접근 가능해짐
     
 
+# 조회 응답용 모델, include=students로 소속 학생들을 함께 요청한 경우 사용
+class CollegeRead(CollgeBase):
+    college_id : int
+    tell_num : Optional[str] = None
+    version : int
+
+
+class CollegeReadWithStudents(CollegeRead):
+    students : List["StudentRead"] = [] # StudentRead는 models/__init__.py에서 연결해줌
+
+
 class CollegeCreate(CollgeBase):
     tell_num : Optional[str] = None
 
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Optional, Literal
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# /post/students/import 진행 상황, 워커 어디서든 조회할 수 있도록 메모리가 아닌 db에 기록함(importer.py 참고)
+
+
+class StudentImportTable(SQLModel, table=True):
+    __tablename__ = "StudentImports"
+
+    import_id : Optional[int] = Field(default=None, primary_key=True)
+    format : str # ndjson, csv
+    on_conflict : str # 이미 있는 이름을 건너뛸지(skip) 새 값으로 덮어쓸지(update)
+    status : str = Field(default="receiving") # receiving -> merging -> done 또는 failed
+    rows_received : int = 0 # 본문에서 읽은 행 수(헤더 제외)
+    rows_invalid : int = 0 # 형식 오류로 버린 행
+    rows_duplicate : int = 0 # 파일 안에서 이름이 겹쳐서 버린 행(처음 나온 행만 사용)
+    rows_unknown_college : int = 0 # 존재하지 않는 단과대학을 가리켜서 버린 행
+    rows_inserted : int = 0
+    rows_updated : int = 0 # on_conflict=update에서 덮어쓴 행
+    rows_skipped : int = 0 # on_conflict=skip에서 이미 있는 이름이라 건너뛴 행
+    errors : list = Field(default_factory=list, sa_column=Column(JSONB, nullable=False)) # 버린 행의 처음 IMPORT_MAX_ERRORS개, [{"line" : 3, "detail" : "..."}]
+    error : Optional[str] = None # failed인 경우 이유
+    started_at : datetime = Field(default_factory=datetime.now)
+    finished_at : Optional[datetime] = None
+
+
+ImportFormat = Literal["ndjson", "csv"]
+ImportConflict = Literal["skip", "update"]
@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import SQLModel
+
+
+# /get/stats 응답용 모델, 테이블이 아니라 stats.py의 집계 쿼리 결과 모양
+
+
+class CollegeStudentCount(SQLModel):
+    college_id : Optional[int] = None # 소속이 없는 학생은 college_id, college_name이 null인 행으로 셈
+    college_name : Optional[str] = None
+    students : int
+
+
+class MajorStudentCount(SQLModel):
+    major : Optional[str] = None
+    students : int
+
+
+class AgeBucket(SQLModel):
+    start : int # 구간의 첫 나이(포함)
+    end : int # 구간의 마지막 나이(포함)
+    students : int
+
+
+class AgeStats(SQLModel):
+    students : int
+    min : Optional[int] = None
+    max : Optional[int] = None
+    avg : Optional[float] = None
+    histogram : list[AgeBucket]
+
+
+class StatsRefreshResult(SQLModel):
+    refreshed_at : datetime
+    seconds : float
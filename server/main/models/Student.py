@@ -2,6 +2,8 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional, List, TYPE_CHECKING
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
+from sqlalchemy.orm import declared_attr
 
 
 # Optional[type] = None 을 하면 nullable
@@ -21,14 +23,57 @@ class StudentBase(SQLModel): # 각 객체를 정의하는 최소한의 필수 
 
 class StudentTable(StudentBase, table=True):
     __tablename__ = "Students"
+    # /get/student에서 허용하는 필터, 정렬 조합마다 그대로 사용할 수 있는 인덱스를 둠
+    # (같음 필터 칼럼, 정렬 칼럼, student_id) 순서로 만들어서 필터 -> 정렬 -> 커서 페이지네이션까지 인덱스 하나로 처리함
+    # 인덱스를 추가, 삭제하면 schema.py의 SCHEMA_VERSION을 올려야 기존 db에도 반영됨
+    __table_args__ = (
+        Index("ix_students_age", "age", "student_id"),
+        Index("ix_students_added_at", "added_at", "student_id"),
+        Index("ix_students_college_id", "college_id", "student_id"),
+        Index("ix_students_college_id_age", "college_id", "age", "student_id"),
+        Index("ix_students_college_id_added_at", "college_id", "added_at", "student_id"),
+        Index("ix_students_major", "major", "student_id"),
+        Index("ix_students_major_age", "major", "age", "student_id"),
+        Index("ix_students_major_added_at", "major", "added_at", "student_id"),
+        # /get/student/search의 부분 문자열, 유사도 검색용 trigram 인덱스 (pg_trgm 확장이 필요함, schema.py에서 설치)
+        Index("ix_students_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name" : "gin_trgm_ops"}),
+    )
+
     student_id : Optional[int] = Field(default=None, primary_key=True) # 기본키 지정됨, 이 때 default=None에 int이기 때문에 autoincrement 제약조건 적용됨
     major : Optional[str] = Field(default="미소속") # 여거서 nullable 이지만 default값이 있다는 건 db에 데이터를 넣기 위해 객체를 생성할 때 None이 들어오면 자동으로 default값으로 채우고 나중에 서비스 돌아가다가 해당 값이 None으로 변경될 수 있다는 것
     college_id : Optional[int] = Field(default=None, foreign_key="Colleges.college_id")
     added_at : datetime = Field(default_factory=datetime.now) # default값을 함수로 생성해야 하는 경우 default_factory로 함수를 연결, 이 때 default value 생성 함수가 인자가 필요하다면 lambda식을 사용하면 됨
+    # 행이 수정될 때마다 1씩 올라가는 버전, 조회 API의 ETag를 만들 때 사용함
+    # version_id_col로 지정하면 orm으로 UPDATE 할 때마다 sqlalchemy가 버전을 올리고 WHERE version = (읽었을 때의 버전) 조건을 붙여서
+    # 그 사이에 다른 요청이 먼저 수정한 경우 StaleDataError를 발생시킴
+    version : int = Field(default=1, sa_column_kwargs={"server_default" : "1"})
+
+    @declared_attr
+    def __mapper_args__(cls):
+        return {"version_id_col" : cls.__table__.c.version}
 
     collge : Optional["CollegeTable"] = Relationship(back_populates="students") # 객체 수준에서 Student와 연관된 College 객체를 바로 접근 가능해짐
 
 
+# 조회 응답용 모델, include=college로 단과대학 정보를 함께 요청한 경우 사용
+class StudentRead(StudentBase):
+    student_id : int
+    major : Optional[str] = None
+    college_id : Optional[int] = None
+    added_at : datetime
+    version : int
+
+
+class StudentReadWithCollege(StudentRead):
+    college : Optional["CollegeRead"] = None # CollegeRead는 models/__init__.py에서 연결해줌
+
+
+# 자동완성(/get/student/autocomplete) 응답용 모델
+class StudentName(SQLModel):
+    student_id : int
+    name : str
+
+
 class StudentCreate(StudentBase):
     major : Optional[str] = "미소속"
     college_id : Optional[int] = None
@@ -1,2 +1,11 @@
 from . import Student
-from . import College
\ No newline at end of file
+from . import College
+from . import Stats
+from . import Bulk
+from . import Import
+
+
+# Student.py와 College.py는 서로를 임포팅할 수 없기 때문에(순환 임포트) 서로를 참조하는 응답 모델은 문자열로 타입을 적어두고
+# 두 모듈을 모두 불러온 여기서 실제 클래스를 연결해줌
+Student.StudentReadWithCollege.model_rebuild(_types_namespace={"CollegeRead" : College.CollegeRead})
+College.CollegeReadWithStudents.model_rebuild(_types_namespace={"StudentRead" : Student.StudentRead})
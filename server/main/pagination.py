@@ -0,0 +1,46 @@
+import base64
+import json
+
+from fastapi import HTTPException, status
+
+
+# offset 페이지네이션은 offset 만큼의 행을 db가 실제로 읽고 버려야 하기 때문에 뒤쪽 페이지로 갈수록 느려짐
+# 커서(keyset) 페이지네이션은 "마지막으로 받은 행의 정렬 키 이후부터" 조회하기 때문에 인덱스를 타고 바로 해당 위치로 이동할 수 있음
+# 즉 몇 번째 페이지든 첫 페이지와 같은 비용으로 조회 가능
+#
+# 커서는 {"k" : 정렬 기준 칼럼, "v" : [마지막 행의 정렬 값, 마지막 행의 기본키]}를 json -> base64로 인코딩한 문자열
+# 클라이언트는 커서의 내용을 알 필요 없이 응답 헤더로 받은 커서를 다음 요청의 cursor 쿼리로 그대로 넘기면 됨
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# 한 번에 조회할 수 있는 최대 개수
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(sort_key : str, sort_value, pk) -> str:
+    payload = json.dumps({"k" : sort_key, "v" : [sort_value, pk]}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor : str, sort_key : str):
+    """커서를 (정렬 값, 기본키)로 되돌림, 잘못된 커서이거나 다른 정렬 기준으로 만들어진 커서라면 400을 반환"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["k"] != sort_key:
+            raise ValueError("sort key mismatch")
+        sort_value, pk = payload["v"]
+        if not isinstance(pk, int):
+            raise ValueError("invalid primary key")
+        return sort_value, pk
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="잘못된 커서입니다")
+
+
+# 조회 결과가 요청한 개수만큼 꽉 찼다면 다음 페이지가 있을 수 있으므로 마지막 행으로 다음 커서를 만들어 헤더에 담음
+# sort_key는 커서에 기록할 정렬 기준(예: "-age"), sort_attr, pk_attr는 행에서 값을 꺼낼 속성 이름
+def set_next_cursor(response, rows, limit : int, sort_key : str, sort_attr : str, pk_attr : str):
+    if len(rows) < limit:
+        return
+
+    last = rows[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_key, getattr(last, sort_attr), getattr(last, pk_attr))
@@ -0,0 +1,162 @@
+from datetime import datetime
+
+from sqlmodel import select
+from sqlalchemy import bindparam, tuple_, any_, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from models import Student, College
+
+
+# 조회 라우터에서 자주 쓰는 쿼리들을 모듈을 불러올 때 한 번만 만들어 둠
+# 값이 바뀌는 부분은 bindparam으로 비워두고 실행할 때 params로 값을 넘기기 때문에 요청마다 select(...) 객체를 새로 만들 필요가 없고
+# SQL 문자열이 항상 같아서 SQLAlchemy의 컴파일 캐시와 asyncpg의 prepared statement 캐시를 그대로 재사용할 수 있음
+# 예) await session.exec(queries.COLLEGE_RANGE, params={"offset" : 0, "limit" : 10})
+
+# offset 조회도 정렬 기준이 없으면 페이지마다 순서가 바뀔 수 있기 때문에 기본키로 정렬함
+COLLEGE_RANGE = (
+    select(College.CollegeTable)
+    .order_by(College.CollegeTable.college_id)
+    .offset(bindparam("offset"))
+    .limit(bindparam("limit"))
+)
+
+# 커서 조회, 마지막으로 받은 college_id 다음부터 기본키 인덱스를 타고 바로 조회함
+COLLEGE_AFTER = (
+    select(College.CollegeTable)
+    .where(College.CollegeTable.college_id > bindparam("after"))
+    .order_by(College.CollegeTable.college_id)
+    .limit(bindparam("limit"))
+)
+
+COLLEGE_BY_ID = (
+    select(College.CollegeTable)
+    .where(College.CollegeTable.college_id == bindparam("college_id"))
+)
+
+STUDENT_BY_ID = (
+    select(Student.StudentTable)
+    .where(Student.StudentTable.student_id == bindparam("student_id"))
+)
+
+
+# ids 일괄 조회
+# IN (:id1, :id2, ...)은 id 개수마다 SQL 문자열이 달라져서 prepared statement를 재사용하지 못하기 때문에
+# id 목록을 배열 하나로 넘기는 = ANY(:ids)를 사용함, postgres에서는 IN과 같은 기본키 인덱스 탐색으로 처리됨
+COLLEGE_BY_IDS = (
+    select(College.CollegeTable)
+    .where(College.CollegeTable.college_id == any_(bindparam("ids", type_=ARRAY(Integer))))
+)
+
+STUDENT_BY_IDS = (
+    select(Student.StudentTable)
+    .where(Student.StudentTable.student_id == any_(bindparam("ids", type_=ARRAY(Integer))))
+)
+
+
+
+# STUDENT 목록 조회 -----------------------------------------------------------------------------------------------------------------------------------------------
+# 학생 목록은 필터, 정렬 조합에 따라 쿼리 모양이 달라지기 때문에 함수로 만듦
+# 값은 SQLAlchemy가 알아서 바인드 파라미터로 빼내기 때문에 같은 조합이면 SQL 문자열이 같아서 컴파일 캐시, prepared statement를 그대로 재사용함
+# 각 조합은 models/Student.py에 선언한 인덱스 중 하나로 처리됨
+
+STUDENT_SORT_KEYS = {
+    "student_id" : Student.StudentTable.student_id,
+    "age" : Student.StudentTable.age,
+    "added_at" : Student.StudentTable.added_at,
+}
+STUDENT_EQUALITY_FILTERS = ("college_id", "major")
+
+
+# 커서에 json으로 들어있던 정렬 값을 칼럼 타입으로 되돌림, 잘못된 값이면 ValueError
+def parse_student_sort_value(sort_key : str, value):
+    if sort_key == "added_at":
+        return datetime.fromisoformat(value)
+    if not isinstance(value, int):
+        raise ValueError("invalid sort value")
+    return value
+
+
+# added_at은 타임존 없이 서버 시각(datetime.now)으로 저장되기 때문에 타임존이 붙은 값은 서버 시각으로 바꾼 뒤 타임존을 뗌
+def _to_server_time(value : datetime):
+    if value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def student_filter_conditions(
+    college_id : int | None = None,
+    major : str | None = None,
+    age_min : int | None = None,
+    age_max : int | None = None,
+    added_after : datetime | None = None,
+    added_before : datetime | None = None
+):
+    table = Student.StudentTable
+    conditions = []
+    if college_id is not None:
+        conditions.append(table.college_id == college_id)
+    if major is not None:
+        conditions.append(table.major == major)
+    if age_min is not None:
+        conditions.append(table.age >= age_min)
+    if age_max is not None:
+        conditions.append(table.age <= age_max)
+    if added_after is not None:
+        conditions.append(table.added_at >= _to_server_time(added_after))
+    if added_before is not None:
+        conditions.append(table.added_at < _to_server_time(added_before))
+    return conditions
+
+
+def student_list_query(
+    sort : str = "student_id", 
+    offset : int = 0, 
+    limit : int | None = 10, 
+    after : tuple | None = None, 
+    **filters
+):
+    """
+    sort : 정렬 칼럼 이름, 앞에 -를 붙이면 내림차순
+    after : 커서에서 꺼낸 (마지막 행의 정렬 값, 마지막 행의 student_id), 있으면 offset 대신 그 다음 행부터 조회
+    limit : None이면 조건에 맞는 행을 모두 조회(내보내기용)
+    filters : student_filter_conditions의 인자
+    """
+    table = Student.StudentTable
+    descending = sort.startswith("-")
+    sort_column = STUDENT_SORT_KEYS[sort.lstrip("-")]
+
+    statement = select(table).where(*student_filter_conditions(**filters))
+
+    # 정렬 값이 같은 행이 여러 개일 수 있기 때문에 student_id를 함께 정렬 기준으로 사용해야 커서 위치가 하나로 정해짐
+    order_columns = [table.student_id] if sort_column is table.student_id else [sort_column, table.student_id]
+
+    if after is not None:
+        sort_value, pk = after
+        if len(order_columns) == 1:
+            cursor_position = (table.student_id < pk) if descending else (table.student_id > pk)
+        else: # (age, student_id) > (20, 153) 처럼 행 단위로 비교해야 인덱스 범위 탐색을 그대로 사용함
+            keys = tuple_(sort_column, table.student_id)
+            cursor_position = (keys < tuple_(sort_value, pk)) if descending else (keys > tuple_(sort_value, pk))
+        statement = statement.where(cursor_position)
+    else:
+        statement = statement.offset(offset)
+
+    return (
+        statement
+        .order_by(*[column.desc() if descending else column for column in order_columns])
+        .limit(limit)
+    )
+
+
+# 서버가 시작될 때 미리 한 번씩 실행해서 컴파일, prepare 해둘 쿼리와 그 때 사용할 파라미터
+# 실제 데이터가 없어도 되기 때문에 결과가 비는 값을 사용함
+HOT_QUERIES = [
+    (COLLEGE_RANGE, {"offset" : 0, "limit" : 1}),
+    (COLLEGE_AFTER, {"after" : 0, "limit" : 1}),
+    (COLLEGE_BY_ID, {"college_id" : 0}),
+    (COLLEGE_BY_IDS, {"ids" : [0]}),
+    (student_list_query(limit=1), {}),
+    (student_list_query(limit=1, after=(0, 0)), {}),
+    (STUDENT_BY_ID, {"student_id" : 0}),
+    (STUDENT_BY_IDS, {"ids" : [0]}),
+]
@@ -0,0 +1,120 @@
+from sqlmodel import SQLModel
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import models # SQLModel.metadata에 모든 테이블 객체가 등록되도록 임포팅
+
+
+# gunicorn 워커 4개가 동시에 뜨면서 각자 create_all을 실행하면 매번 카탈로그 조회를 하고 워커끼리 테이블 생성을 두고 경쟁하게 됨
+# 따라서 DB에 현재 스키마 버전을 기록해두고 버전이 같으면 아무것도 하지 않고 바로 서버를 시작하도록 함
+# 버전이 다르면(새로 배포된 경우) postgres advisory lock을 잡은 워커 하나만 스키마를 갱신하고 나머지 워커는 락이 풀릴 때까지 기다렸다가 그대로 시작함
+#
+# 모델이나 인덱스를 바꾸면 SCHEMA_VERSION을 1 올리고
+# create_all로 처리할 수 없는 변경(기존 테이블에 칼럼 추가, 확장 설치, 트리거 등)은 SCHEMA_MIGRATIONS[새 버전]에 SQL로 추가함
+SCHEMA_VERSION = 7 # 2: Students 필터/정렬 인덱스, 3: Colleges 변경 알림 트리거, 4: 행 버전 칼럼, 5: 이름 검색용 trigram 인덱스, 6: 통계 materialized view, 7: 가져오기 진행 상황 테이블
+SCHEMA_MIGRATIONS : dict[int, list[str]] = {
+    # Colleges가 commit 되면 변경된 행을 json으로 담아서 colleges_changed 채널로 알림, 각 워커의 college_replica가 받아서 메모리의 사본을 갱신함
+    # pg_notify는 트랜잭션이 commit 될 때 전달되고 rollback 되면 전달되지 않음
+    3 : [
+        """
+        CREATE OR REPLACE FUNCTION notify_colleges_changed() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                PERFORM pg_notify('colleges_changed', json_build_object('op', TG_OP)::text);
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify(
+                'colleges_changed',
+                json_build_object('op', TG_OP, 'row', CASE WHEN TG_OP = 'DELETE' THEN row_to_json(OLD) ELSE row_to_json(NEW) END)::text
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        'DROP TRIGGER IF EXISTS colleges_changed ON "Colleges"',
+        'CREATE TRIGGER colleges_changed AFTER INSERT OR UPDATE OR DELETE ON "Colleges" FOR EACH ROW EXECUTE FUNCTION notify_colleges_changed()',
+        'DROP TRIGGER IF EXISTS colleges_truncated ON "Colleges"',
+        'CREATE TRIGGER colleges_truncated AFTER TRUNCATE ON "Colleges" FOR EACH STATEMENT EXECUTE FUNCTION notify_colleges_changed()',
+    ],
+    # 이미 있는 테이블에는 create_all이 칼럼을 추가하지 않기 때문에 직접 추가함, 기존 행은 모두 버전 1로 시작
+    4 : [
+        'ALTER TABLE "Students" ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1',
+        'ALTER TABLE "Colleges" ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1',
+    ],
+    # /get/stats?source=view가 읽는 집계 결과(stats.py), REFRESH ... CONCURRENTLY로 갱신하려면 view마다 unique 인덱스가 있어야 함
+    # 나이는 나이별 학생 수로 저장해두고 구간 크기(bucket)는 조회할 때 정함
+    6 : [
+        'CREATE MATERIALIZED VIEW IF NOT EXISTS student_stats_by_college AS SELECT college_id, count(*) AS students FROM "Students" GROUP BY college_id',
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_student_stats_by_college ON student_stats_by_college (college_id)',
+        'CREATE MATERIALIZED VIEW IF NOT EXISTS student_stats_by_major AS SELECT major, count(*) AS students FROM "Students" GROUP BY major',
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_student_stats_by_major ON student_stats_by_major (major)',
+        'CREATE MATERIALIZED VIEW IF NOT EXISTS student_stats_by_age AS SELECT age, count(*) AS students FROM "Students" GROUP BY age',
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_student_stats_by_age ON student_stats_by_age (age)',
+        'CREATE MATERIALIZED VIEW IF NOT EXISTS student_stats_refreshed AS SELECT 1 AS id, now() AS refreshed_at',
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_student_stats_refreshed ON student_stats_refreshed (id)',
+    ],
+}
+
+# 모델에 선언한 인덱스가 사용하는 확장, 인덱스를 만들기 전에 설치해야 하기 때문에 마이그레이션보다 먼저 설치함
+# pg_trgm은 trusted 확장이라 superuser가 아니어도 db 소유자라면 설치할 수 있음
+SCHEMA_EXTENSIONS = ["pg_trgm"]
+
+SCHEMA_LOCK_KEY = 7_342_001 # 스키마 갱신용 advisory lock 번호, 다른 용도의 락과 겹치지만 않으면 됨
+
+
+async def _read_version(conn):
+    result = await conn.execute(text("SELECT version FROM schema_version WHERE id = 1"))
+    return result.scalar_one_or_none() or 0
+
+
+# create_all은 없는 테이블만 만들고 이미 있는 테이블에 새로 선언한 인덱스는 만들지 않기 때문에 인덱스는 따로 확인해서 생성함
+def _create_tables_and_indexes(sync_conn):
+    SQLModel.metadata.create_all(sync_conn)
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def bootstrap_schema(engine : AsyncEngine):
+    # 대부분의 재시작은 여기서 쿼리 한 번으로 끝남
+    async with engine.connect() as conn:
+        try:
+            if await _read_version(conn) >= SCHEMA_VERSION:
+                return False
+        except ProgrammingError: # schema_version 테이블이 없는 경우 = 처음 배포
+            pass
+
+    async with engine.begin() as conn:
+        # 트랜잭션 단위 락이기 때문에 commit 되는 순간 자동으로 풀림
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key" : SCHEMA_LOCK_KEY})
+
+        await conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "id integer PRIMARY KEY CHECK (id = 1), "
+            "version integer NOT NULL, "
+            "applied_at timestamptz NOT NULL DEFAULT now())"
+        ))
+
+        # 락을 기다리는 동안 다른 워커가 이미 갱신을 끝냈을 수 있음
+        # 새 버전이 배포된 뒤에 예전 버전의 워커가 재시작되는 경우(롤링 재시작)에도 스키마를 건드리지 않음
+        current = await _read_version(conn)
+        if current >= SCHEMA_VERSION:
+            return False
+
+        for extension in SCHEMA_EXTENSIONS:
+            await conn.execute(text(f'CREATE EXTENSION IF NOT EXISTS "{extension}"'))
+        await conn.run_sync(_create_tables_and_indexes)
+        for version in range(current + 1, SCHEMA_VERSION + 1):
+            for statement in SCHEMA_MIGRATIONS.get(version, []):
+                await conn.execute(text(statement))
+
+        await conn.execute(
+            text(
+                "INSERT INTO schema_version (id, version) VALUES (1, :version) "
+                "ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version, applied_at = now()"
+            ),
+            {"version" : SCHEMA_VERSION}
+        )
+
+    return True
@@ -0,0 +1,47 @@
+from sqlmodel import select
+from sqlalchemy import func, or_
+from fastapi import HTTPException, status
+
+import unicodedata
+
+
+# 이름 검색 -------------------------------------------------------------------------------------------------------------------------------------------------------
+# pg_trgm의 trigram(연속된 3글자) GIN 인덱스로 부분 문자열 검색과 오타를 허용하는 유사도 검색을 함께 처리함
+#   부분 문자열 : name ILIKE '%q%', trigram 인덱스는 앞뒤가 %인 LIKE도 인덱스로 찾을 수 있음
+#   유사도      : name %> q, q의 trigram과 name 일부분의 trigram이 pg_trgm.word_similarity_threshold(기본 0.6) 이상 겹치면 일치
+# 결과는 word_similarity(q, name)이 높은 순, 같으면 전체 유사도(similarity)가 높은 순(이름 길이가 q와 비슷한 순)으로 정렬하고
+# 마지막으로 기본키로 정렬해서 offset으로 페이지를 넘겨도 순서가 바뀌지 않도록 함
+#
+# 한글 : tsvector는 공백 단위로 단어를 나누기 때문에(default_text_search_config = 'pg_catalog.simple')
+#        "길동"으로 "홍길동"을 찾을 수 없음, 그래서 글자 단위로 동작하는 trigram을 사용함
+#        pg_trgm은 db의 LC_CTYPE으로 글자가 단어 문자인지 판단하기 때문에 db가 UTF-8 로캘(postgres 이미지 기본값 en_US.utf8)이어야 한글이 무시되지 않음
+#        맥 등에서 입력한 한글은 자모가 분리된 NFD로 들어올 수 있어서 저장된 값과 같은 NFC로 정규화한 뒤 검색함
+#        한글 이름은 2~3글자라서 trigram이 적기 때문에 1~2글자 검색은 유사도보다 부분 문자열 일치로 찾아짐
+SEARCH_MAX_LENGTH = 100
+
+
+def normalize_query(q : str):
+    q = unicodedata.normalize("NFC", q).strip()
+    if not q:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="검색어를 입력해주세요")
+    return q
+
+
+def escape_like(value : str):
+    """LIKE 패턴의 특수 문자(%, _, \\)를 일반 문자로 검색하도록 이스케이프"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_statement(table, column, pk, q : str, offset : int, limit : int):
+    """
+    column : 검색할 칼럼(trigram 인덱스가 있어야 함)
+    pk : 같은 점수끼리 정렬할 기본키 칼럼
+    """
+    pattern = f"%{escape_like(q)}%"
+    return (
+        select(table)
+        .where(or_(column.ilike(pattern, escape="\\"), column.op("%>")(q)))
+        .order_by(func.word_similarity(q, column).desc(), func.similarity(q, column).desc(), pk)
+        .offset(offset)
+        .limit(limit)
+    )
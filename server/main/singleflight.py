@@ -0,0 +1,119 @@
+from urllib.parse import parse_qsl, urlencode
+
+from util import LAST_WRITE_COOKIE
+
+import os
+import asyncio
+
+
+# 같은 조회 요청 합치기(single-flight) -------------------------------------------------------------------------------------------------------------------------------
+# 인기 있는 페이지에 요청이 몰리면 조회 결과 캐시가 비어 있는 순간(TTL 만료, 쓰기로 인한 무효화 직후) 동시에 들어온 요청이 모두 같은 쿼리를 실행함
+# 워커 안에서 같은 조회 요청(경로 + 정렬한 쿼리 문자열)이 이미 처리 중이라면 새로 처리하지 않고 먼저 온 요청(leader)의 응답을 기다렸다가 같은 응답을 돌려받음
+# 즉 동시에 몰린 요청 수와 상관없이 db 쿼리, 직렬화는 한 번만 일어남
+#
+# 합치지 않고 각자 처리하는 경우
+#   - 스트리밍 응답(/get/student/export 등) : 응답 전체를 메모리에 모아둘 수 없기 때문에 leader가 스트리밍을 시작하면 기다리던 요청은 각자 처리함
+#   - leader가 오류로 끝나거나 취소된 경우 : 기다리던 요청은 각자 처리함
+#   - 방금 쓰기를 한 클라이언트(last_write_at 쿠키) : 쓰기 전에 시작된 leader의 결과를 받으면 자신이 쓴 내용이 보이지 않을 수 있음
+# If-None-Match에 따라 304, 200으로 응답이 달라지기 때문에 키에 포함함
+# 압축 미들웨어보다 안쪽에 두어서 압축은 Accept-Encoding에 맞춰 요청마다 따로 함(compression.py의 압축 본문 캐시로 한 번만 압축됨)
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "1") == "1"
+SINGLE_FLIGHT_PREFIXES = tuple(prefix.strip() for prefix in os.getenv("SINGLE_FLIGHT_PREFIXES", "/get/").split(",") if prefix.strip())
+
+
+def _header(headers, name : bytes):
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def flight_key(scope):
+    """경로 + 이름 순으로 정렬한 쿼리 문자열 + If-None-Match, 합칠 수 없는 요청이면 None"""
+    if scope["type"] != "http" or scope["method"] != "GET":
+        return None
+    path = scope["path"].removeprefix(scope.get("root_path", ""))
+    if not path.startswith(SINGLE_FLIGHT_PREFIXES):
+        return None
+
+    headers = scope["headers"]
+    cookie = _header(headers, b"cookie")
+    if cookie and f"{LAST_WRITE_COOKIE}=" in cookie:
+        return None
+
+    query = urlencode(sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+    return (path, query, _header(headers, b"if-none-match"))
+
+
+class SingleFlight:
+    """처리 중인 요청 목록과 통계, 미들웨어 객체는 Starlette가 첫 요청 때 만들기 때문에 상태는 모듈 전역 객체에 둠"""
+
+    def __init__(self):
+        self.flights : dict[tuple, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0 # leader의 응답을 그대로 받은 요청 수
+        self.fallbacks = 0 # 기다렸지만 leader의 응답을 받지 못하고 각자 처리한 요청 수
+
+    def finish(self, key, flight : asyncio.Future, messages):
+        # leader의 응답이 끝나면 바로 목록에서 빼서 이후에 온 요청은 새로 처리함(결과는 조회 결과 캐시가 재사용함)
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+        if not flight.done():
+            flight.set_result(messages)
+
+    def stats(self):
+        return {
+            "enabled" : SINGLE_FLIGHT,
+            "in_flight" : len(self.flights),
+            "leaders" : self.leaders,
+            "followers" : self.followers,
+            "fallbacks" : self.fallbacks
+        }
+
+
+single_flight = SingleFlight()
+
+
+class SingleFlightMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        key = flight_key(scope) if SINGLE_FLIGHT else None
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        group = single_flight
+        flight = group.flights.get(key)
+        if flight is not None:
+            messages = await asyncio.shield(flight) # 기다리던 요청이 취소되어도 leader의 future는 취소되지 않도록 함
+            if messages is None:
+                group.fallbacks += 1
+                await self.app(scope, receive, send)
+                return
+            group.followers += 1
+            for message in messages:
+                await send(dict(message)) # 바깥 미들웨어(압축)가 메시지의 헤더를 바꾸기 때문에 요청마다 복사해서 보냄
+            return
+
+        flight = asyncio.get_running_loop().create_future()
+        group.flights[key] = flight
+        group.leaders += 1
+        messages = []
+
+        async def send_and_capture(message):
+            if not flight.done():
+                if message["type"] == "http.response.body" and message.get("more_body", False):
+                    group.finish(key, flight, None) # 스트리밍 응답은 합치지 않음
+                else:
+                    messages.append(dict(message))
+                    if message["type"] == "http.response.body":
+                        group.finish(key, flight, messages)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_capture)
+        finally:
+            group.finish(key, flight, None) # 응답을 끝까지 보내지 못한 경우(오류, 취소)
@@ -0,0 +1,150 @@
+from sqlmodel import select
+from sqlalchemy import func, text, table, column, cast, BigInteger
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from models import Student, College
+from cache import invalidate_tables
+
+import os
+import time
+import asyncio
+
+
+# 학생 통계 -------------------------------------------------------------------------------------------------------------------------------------------------------
+# 단과대학별, 전공별 학생 수와 나이 분포를 /get/student로 전체를 받아와서 파이썬에서 세지 않고 postgres의 GROUP BY로 집계해서 결과만 받아옴
+# 통계 하나당 db 왕복 한 번이고 응답 크기는 학생 수가 아니라 그룹 수에 비례함
+#
+# source=live : 요청마다 Students를 직접 집계함, 항상 최신이지만 학생 수에 비례해서 느려짐
+# source=view : schema.py의 6번 마이그레이션으로 만든 materialized view(미리 집계해둔 결과)를 읽음, 그룹 수만큼만 읽기 때문에 빠르지만
+#               마지막으로 갱신한 시점(X-Stats-Refreshed-At 헤더)의 값임
+# view는 STATS_REFRESH_INTERVAL초마다 워커 중 하나가 갱신하고 POST /post/stats/refresh로 바로 갱신할 수도 있음
+STATS_REFRESH_INTERVAL = float(os.getenv("STATS_REFRESH_INTERVAL", "300")) # 0이면 주기적으로 갱신하지 않음
+STATS_REFRESH_LOCK_KEY = 7_342_002 # 갱신용 advisory lock 번호, 여러 워커가 동시에 갱신하지 않도록 함
+REFRESHED_AT_HEADER = "X-Stats-Refreshed-At"
+
+by_college_view = table("student_stats_by_college", column("college_id"), column("students"))
+by_major_view = table("student_stats_by_major", column("major"), column("students"))
+by_age_view = table("student_stats_by_age", column("age"), column("students"))
+refreshed_view = table("student_stats_refreshed", column("id"), column("refreshed_at"))
+
+# 갱신 순서대로, 모든 view를 한 트랜잭션에서 갱신하기 때문에 refreshed_view의 now()는 집계 기준 시각(트랜잭션 시작 시각)임
+STATS_VIEWS = [by_college_view, by_major_view, by_age_view, refreshed_view]
+
+
+def _counts(view, *keys):
+    """source에 따라 (키, 학생 수) 집계를 Students에서 직접 하거나 view에서 읽음"""
+    if view is not None:
+        return view
+    return select(*keys, func.count().label("students")).group_by(*keys).subquery()
+
+
+def college_counts_query(use_view : bool):
+    """단과대학별 학생 수, 학생이 없는 단과대학은 0, 소속이 없는 학생은 college_id가 null인 행으로 반환"""
+    counts = _counts(by_college_view if use_view else None, Student.StudentTable.college_id)
+    colleges = College.CollegeTable.__table__
+    college_id = func.coalesce(colleges.c.college_id, counts.c.college_id)
+    return (
+        select(
+            college_id.label("college_id"),
+            colleges.c.college_name,
+            func.coalesce(counts.c.students, 0).label("students")
+        )
+        .select_from(colleges.join(counts, colleges.c.college_id == counts.c.college_id, full=True))
+        .order_by(college_id.asc().nulls_last())
+    )
+
+
+def major_counts_query(use_view : bool):
+    counts = _counts(by_major_view if use_view else None, Student.StudentTable.major)
+    return select(counts.c.major, counts.c.students).order_by(counts.c.students.desc(), counts.c.major)
+
+
+def age_histogram_query(use_view : bool, bucket : int):
+    """나이를 bucket 크기의 구간으로 나눠서 구간별 학생 수, 최소, 최대, 나이 합계를 반환"""
+    counts = _counts(by_age_view if use_view else None, Student.StudentTable.age)
+    start = (counts.c.age - counts.c.age % bucket).label("start")
+    return (
+        select(
+            start,
+            cast(func.sum(counts.c.students), BigInteger).label("students"), # sum(bigint)은 numeric(Decimal)을 반환하기 때문에 정수로 바꿈
+            func.min(counts.c.age).label("min_age"),
+            func.max(counts.c.age).label("max_age"),
+            cast(func.sum(counts.c.age * counts.c.students), BigInteger).label("age_sum")
+        )
+        .group_by(start)
+        .order_by(start)
+    )
+
+
+def summarize_ages(rows, bucket : int):
+    """구간별 집계 결과로 전체 요약을 만듦, 구간 수만큼만 반복함"""
+    total = sum(row.students for row in rows)
+    return {
+        "students" : total,
+        "min" : min((row.min_age for row in rows), default=None),
+        "max" : max((row.max_age for row in rows), default=None),
+        "avg" : sum(row.age_sum for row in rows) / total if total else None,
+        "histogram" : [{"start" : row.start, "end" : row.start + bucket - 1, "students" : row.students} for row in rows]
+    }
+
+
+REFRESHED_AT_QUERY = select(refreshed_view.c.refreshed_at)
+
+
+# 갱신 ------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+async def refresh_views(engine : AsyncEngine, skip_if_newer_than : float = 0):
+    """
+    view를 모두 다시 집계함, 다른 워커가 갱신 중이거나 마지막 갱신 후 skip_if_newer_than초가 지나지 않았다면 갱신하지 않고 None을 반환
+    CONCURRENTLY로 갱신하기 때문에 갱신하는 동안에도 view를 읽는 요청은 막히지 않음
+    """
+    async with engine.begin() as conn:
+        locked = (await conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key" : STATS_REFRESH_LOCK_KEY})).scalar_one()
+        if not locked:
+            return None
+        if skip_if_newer_than > 0:
+            age = (await conn.execute(select(func.extract("epoch", func.now() - refreshed_view.c.refreshed_at)))).scalar_one()
+            if age < skip_if_newer_than:
+                return None
+
+        started = time.perf_counter()
+        for view in STATS_VIEWS:
+            await conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view.name}"))
+        refreshed_at = (await conn.execute(REFRESHED_AT_QUERY)).scalar_one()
+
+    # 이 워커의 조회 결과 캐시에 남아있는 이전 집계를 지움, 다른 워커는 캐시 TTL이 지나면 새 값을 읽음
+    invalidate_tables(*(view.name for view in STATS_VIEWS))
+    return {"refreshed_at" : refreshed_at, "seconds" : time.perf_counter() - started}
+
+
+class StatsRefresher:
+    """STATS_REFRESH_INTERVAL초마다 view를 갱신, 모든 워커가 돌지만 마지막 갱신 시각을 db에서 확인하기 때문에 주기마다 한 번만 갱신됨"""
+
+    def __init__(self):
+        self._task : asyncio.Task | None = None
+
+    async def _run(self, engine : AsyncEngine):
+        while True:
+            await asyncio.sleep(STATS_REFRESH_INTERVAL)
+            try:
+                await refresh_views(engine, skip_if_newer_than=STATS_REFRESH_INTERVAL * 0.9)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f">>>>> Stats refresh error <<<<< \n {str(e)}")
+
+    def start(self, engine : AsyncEngine):
+        if STATS_REFRESH_INTERVAL > 0:
+            self._task = asyncio.create_task(self._run(engine))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+stats_refresher = StatsRefresher()
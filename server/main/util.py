@@ -1,9 +1,23 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
-from sqlmodel import create_engine, Session, SQLModel
+from fastapi import FastAPI, Request
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from schema import bootstrap_schema
+from queries import HOT_QUERIES
+from cache import CACHE_SESSION_KEY, QUERY_CACHE_TTL
+from college_replica import colleges
+from autocomplete import student_names
+from stats import stats_refresher
 
 import os
+import time
+import asyncio
+import itertools
 
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
@@ -13,28 +27,267 @@ DB_NAME = os.getenv("DB_NAME")
 
 # 형식: postgresql://사용자이름:비밀번호@호스트:포트/데이터베이스이름
 POSTGRES_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{DB_NAME}:{DB_PORT}/{POSTGRES_DB}"
+# 비동기 엔진은 드라이버만 asyncpg로 바꿔서 같은 DB에 접속함
+ASYNC_POSTGRES_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{DB_NAME}:{DB_PORT}/{POSTGRES_DB}"
+
+
+
+# 커넥션 풀 설정 --------------------------------------------------------------------------------------------------------------------------------------------------
+# gunicorn 워커는 각자 독립된 프로세스이기 때문에 워커마다 별도의 커넥션 풀을 가짐
+# 즉 (워커 수) x (워커당 최대 연결 수)가 postgresql.conf의 max_connections를 넘으면 DB가 연결을 거부하게 됨
+# 따라서 DB가 허용하는 전체 연결 수에서 관리용 연결을 뺀 나머지를 워커 수로 나눠서 워커 하나가 사용할 수 있는 연결 수를 정함
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1")) # gunicorn도 같은 환경변수로 워커 수를 정함, 개발 환경(uvicorn 단독 실행)에서는 1
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "50")) # postgresql.conf의 max_connections와 맞춰야 함
+DB_RESERVED_CONNECTIONS = int(os.getenv("DB_RESERVED_CONNECTIONS", "5")) # superuser 예약 연결(기본 3) + DBeaver 같은 관리 도구용 여유분
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5")) # 풀이 가득 찼을 때 연결을 기다리는 최대 시간(초), 기본값 30초는 꼬리 지연시간을 키우기만 함
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # 오래된 연결은 재생성하여 DB나 방화벽 쪽에서 끊어버린 연결을 쓰지 않도록 함
+
+# 동기 engine은 이벤트 루프 밖에서만 가끔 사용하기 때문에 연결 1개만 할당하고
+# 단과대 사본(college_replica.py)이 LISTEN용으로 풀 밖에서 직접 여는 연결 1개를 빼고 나머지는 비동기 엔진에 할당
+# 예) 워커 4개, max_connections 50, 예약 5 -> 워커마다 (50 - 5) // 4 = 11개 = 비동기 9 + 동기 1 + LISTEN 1, 전체 44개
+SYNC_POOL_SIZE = 1
+LISTEN_CONNECTIONS = 1
+DB_CONNECTIONS_PER_WORKER = max(2, (DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS) // WEB_CONCURRENCY - SYNC_POOL_SIZE - LISTEN_CONNECTIONS)
+# 항상 유지하는 연결(pool_size)과 부하가 몰릴 때만 잠깐 여는 연결(max_overflow)을 3:1 정도로 나눔
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", max(1, DB_CONNECTIONS_PER_WORKER * 3 // 4)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", max(0, DB_CONNECTIONS_PER_WORKER - DB_POOL_SIZE)))
+# 서버가 시작될 때 엔진마다 미리 열어둘 연결 수, 0이면 첫 요청이 들어올 때 연결을 만듦 (pool_size보다 크게 잡아도 pool_size까지만 열림)
+DB_POOL_WARMUP = min(int(os.getenv("DB_POOL_WARMUP", "0")), DB_POOL_SIZE)
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    """
+    커넥션을 얻기까지 기다린 시간과 연결을 빌려간 뒤 반납하기까지의 시간(점유 시간)을 기록하는 커넥션 풀
+    풀이 가득 차면 요청은 다른 요청이 연결을 반납할 때까지 대기하는데 이 대기 시간이 그대로 응답 지연으로 이어지기 때문에 따로 측정함
+    점유 시간이 짧을수록 같은 크기의 풀로 더 많은 요청을 동시에 처리할 수 있음
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.checkins = 0
+        self.total_hold = 0.0
+        self.max_hold = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+            record.info["checkout_at"] = time.perf_counter()
+            return record
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def _do_return_conn(self, record):
+        checkout_at = record.info.pop("checkout_at", None)
+        if checkout_at is not None:
+            hold = time.perf_counter() - checkout_at
+            self.checkins += 1
+            self.total_hold += hold
+            self.max_hold = max(self.max_hold, hold)
+        
+        super()._do_return_conn(record)
+
+    def stats(self):
+        return {
+            "pool_size" : self.size(),
+            "max_overflow" : self._max_overflow,
+            "checked_out" : self.checkedout(), # 현재 요청들이 사용 중인 연결 수
+            "checked_in" : self.checkedin(), # 풀에서 놀고 있는 연결 수
+            "overflow" : self.overflow(), # pool_size를 넘어서 추가로 열린 연결 수 (음수면 아직 열리지 않은 기본 연결 수)
+            "checkouts" : self.checkouts,
+            "timeouts" : self.timeouts,
+            "avg_wait_ms" : round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms" : round(self.max_wait * 1000, 3),
+            "avg_hold_ms" : round(self.total_hold / self.checkins * 1000, 3) if self.checkins else 0.0,
+            "max_hold_ms" : round(self.max_hold * 1000, 3)
+        }
+
+
+def create_pooled_async_engine(url : str):
+    return create_async_engine(
+        url, 
+        echo=False,
+        poolclass=MonitoredQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE
+    )
+
+
+engine = create_engine(
+    POSTGRES_URL, 
+    echo=False, # echo를 끄면 db엔진의 로그 출력이 보이지 않음
+    pool_size=SYNC_POOL_SIZE,
+    max_overflow=0,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE
+)
+
+# 라우터 핸들러는 async def로 정의되어 있기 때문에 동기 Session을 그대로 쓰면 DB 응답을 기다리는 동안 이벤트 루프 전체가 멈춤
+# 따라서 라우터에서는 비동기 엔진 + AsyncSession을 사용하고 DB를 기다리는 동안 다른 요청을 처리할 수 있도록 함
+# 동기 engine은 스크립트나 마이그레이션처럼 이벤트 루프 밖에서 DB를 다룰 때 사용
+async_engine = create_pooled_async_engine(ASYNC_POSTGRES_URL)
+
+
+
+# 읽기 전용 복제본(read replica) ----------------------------------------------------------------------------------------------------------------------------------
+# 조회 요청이 대부분이기 때문에 조회는 복제본들로 보내고 쓰기(post, put, delete)만 primary로 보내서 읽기 부하를 따로 늘릴 수 있도록 함
+# 복제본 주소는 콤마로 구분해서 여러 개 설정 가능, 설정하지 않으면 모든 요청이 primary(async_engine)로 감
+# 예) DB_READ_REPLICA_URLS="postgresql+asyncpg://user:pw@replica1:5000/TempDB,postgresql+asyncpg://user:pw@replica2:5000/TempDB"
+DB_READ_REPLICA_URLS = [url.strip() for url in os.getenv("DB_READ_REPLICA_URLS", "").split(",") if url.strip()]
+# 복제본은 primary의 변경 내용을 조금 늦게 받아오기 때문에 방금 쓰기를 한 클라이언트가 바로 조회하면 수정 전 데이터가 보일 수 있음
+# 따라서 쓰기를 한 클라이언트는 다음 시간(초) 동안 조회 요청도 primary로 보냄
+DB_READ_YOUR_WRITES_WINDOW = float(os.getenv("DB_READ_YOUR_WRITES_WINDOW", "5"))
+LAST_WRITE_COOKIE = "last_write_at"
+# 조회 결과 캐시도 워커마다 따로 있어서 다른 워커에서 쓴 내용은 QUERY_CACHE_TTL초 동안 보이지 않기 때문에 둘 중 긴 시간을 사용함
+READ_YOUR_WRITES_WINDOW = max(DB_READ_YOUR_WRITES_WINDOW, QUERY_CACHE_TTL)
 
+replica_engines = [create_pooled_async_engine(url) for url in DB_READ_REPLICA_URLS]
+_replica_cycle = itertools.cycle(replica_engines)
+
+
+# 최근에 쓰기를 한 클라이언트인지 확인, 이 클라이언트의 조회는 복제본과 조회 결과 캐시를 거치지 않고 primary에서 읽음
+def recent_write(request : Request):
+    last_write_at = request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        return bool(last_write_at) and float(last_write_at) + READ_YOUR_WRITES_WINDOW > time.time()
+    except ValueError: # 쿠키 값이 잘못된 경우 쓰기를 하지 않은 클라이언트로 봄
+        return False
+
+
+# 조회 요청을 보낼 엔진을 고름, 복제본이 여러 개라면 돌아가면서(round robin) 하나씩 사용함
+def pick_read_engine(request : Request):
+    if not replica_engines or recent_write(request):
+        return async_engine
+
+    return next(_replica_cycle)
+
+
+# 현재 워커 프로세스의 커넥션 풀 상태를 반환, 워커마다 값이 다르기 때문에 pid를 함께 반환함
+def get_pool_stats():
+    return {
+        "pid" : os.getpid(),
+        "workers" : WEB_CONCURRENCY,
+        "primary" : async_engine.pool.stats(),
+        "replicas" : [
+            {"host" : replica.url.host, "database" : replica.url.database, **replica.pool.stats()}
+            for replica in replica_engines
+        ]
+    }
+
+
+# 배포 직후의 첫 요청들은 DB 연결(TCP + 인증), SQLAlchemy의 SQL 컴파일, postgres의 쿼리 계획(prepare)을 모두 새로 해야 해서 유독 느림
+# 따라서 서버가 시작될 때 연결을 미리 열어두고 각 연결에서 자주 쓰는 쿼리를 한 번씩 실행해둠
+# 이렇게 하면 컴파일된 SQL은 엔진의 컴파일 캐시에, prepared statement는 asyncpg가 연결마다 가지고 있는 캐시에 남아서 첫 요청부터 재사용됨
+async def warm_up_pool(engine, connections : int):
+    async def open_and_prepare():
+        conn = await engine.connect().start()
+        for statement, params in HOT_QUERIES:
+            await conn.execute(statement, params)
+        await conn.rollback()
+        return conn
+
+    # 연결을 모두 동시에 붙잡고 있어야 풀이 서로 다른 연결을 connections개 만큼 열게 됨
+    conns = await asyncio.gather(*[open_and_prepare() for _ in range(connections)], return_exceptions=True)
+    for conn in conns:
+        if isinstance(conn, Exception):
+            print(f">>>>> Pool warm-up failed <<<<< \n {str(conn)}")
+            continue
+        await conn.close() # 연결을 끊는 것이 아니라 풀에 반납함
 
-engine = create_engine(POSTGRES_URL, echo=False) # echo를 끄면 db엔진의 로그 출력이 보이지 않음
 
 # 다음 함수를 fastapi app객체의 lifespan으로 설정하면 DB에 테이블이 존재하지 않을 때 미리 정의해둔 모든 테이블을 생성함
 # SQLModel.metadata로 테이블을 생성하려면 미리 생성할 모든 테이블 객체가 코드 상으로 임포팅되어 있어야 함
 # 이 때 /models/__init__.py에 생성할 테이블에 해당하는 객체를 임포팅 해놓고 app.py에서 import models를 하는게 편리하게 테이블을 초기화 하는 방법임
 # create_all은 테이블이 없을 때만 생성해주기 떄문에 기존 테이블들의 구조가 바뀐다거나 하면 Alembic같은 툴을 사용해야 함
+# 워커마다 create_all을 실행하지 않도록 실제 테이블 생성은 schema.py의 bootstrap_schema가 배포당 한 번만 수행함
 # 아래와 같이 비동기컨텍스트매니저를 사용하면 서버가 실행되고 종료될 때 어떤 행동을 취할지 설정 가능
 # 예를 들어 예기치 않은 오류로 서버가 종료된 경우 오류가 발생하기 전 작업하던 내용들을 따로 저장해 뒀다가 다시 실행될 때 내용을 불러올 수 있음
 @asynccontextmanager
 async def create_db_and_tables(app : FastAPI):
     # on start action
-    SQLModel.metadata.create_all(engine)
+    await bootstrap_schema(async_engine)
+    if DB_POOL_WARMUP:
+        await asyncio.gather(*[warm_up_pool(e, DB_POOL_WARMUP) for e in [async_engine, *replica_engines]])
+    # 변경 알림은 쓰기가 일어나는 primary에서 받음
+    await colleges.start(async_engine.url)
+    student_names.start(async_engine) # 이름 전체를 불러오는 데 시간이 걸리기 때문에 기다리지 않고 백그라운드에서 불러옴
+    stats_refresher.start(async_engine)
     
     yield # 서버가 정상적으로 동작하기 시작하면 yield를 통해 craete_db_and_tables함수를 빠져 나가 다른 코드를 실행함, 다른 코드들이 모두 종료 되면 yield 아래 내용을 실행
 
     # on end action
-    # ~
+    await colleges.stop()
+    await student_names.stop()
+    await stats_refresher.stop()
+    # 커넥션 풀에 남아있는 연결을 정리
+    await async_engine.dispose()
+    for replica in replica_engines:
+        await replica.dispose()
 
 
 # 편하게 세션을 가져오기 위한 함수 어떻게 사용되는지 확인하려면 app.py를 보면 바로 알 수 있음
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+# 비동기 라우터에서 사용하는 세션, 사용법은 get_session과 동일하지만 DB 작업마다 await를 붙여야 함
+# expire_on_commit=False로 설정하지 않으면 commit 이후 orm 객체의 속성에 접근할 때 암묵적으로 다시 조회(lazy load)를 시도하는데
+# 비동기 세션에서는 이러한 암묵적 IO가 허용되지 않아 오류가 발생함
+#
+# 세션 객체를 만드는 것 자체는 DB 연결을 사용하지 않음, 세션은 처음으로 쿼리를 실행할 때 풀에서 연결을 빌려옴
+# 따라서 404, 422처럼 DB를 건드리기 전에 끝나는 요청은 연결을 전혀 사용하지 않음
+# 빌려온 연결은 commit/rollback 또는 세션이 닫힐 때 풀로 반납되는데
+# yield 의존성은 기본적으로 응답을 클라이언트에게 다 보낸 뒤에 닫히기 때문에 조회 API는 응답 직렬화, 전송 시간 동안에도 연결을 붙잡고 있게 됨
+# 라우터에서는 Depends(get_async_session, scope="function")으로 사용해서 응답을 보내기 전에 세션을 닫고 연결을 반납하도록 함
+# 쓰기 API는 마지막 DB 작업이 commit이기 때문에 commit 시점에 연결이 반납됨
+# 쓰기 시각 쿠키(이후 조회가 잠시 primary로 가도록 함)는 쓰기 라우터의 의존성(http_cache.py의 cache_headers)에서 남김
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+class ReadSession(AsyncSession):
+    """
+    조회 전용 세션, 쿼리 결과를 받아오자마자 트랜잭션을 끝내서 연결을 풀에 반납함
+    asyncpg는 쿼리 결과를 모두 메모리로 받아오기 때문에 연결을 반납한 뒤에도 결과를 읽을 수 있음
+    scope="function"만으로는 응답 직렬화(response_model 검증 + json 변환)가 끝난 뒤에야 세션이 닫히는데
+    조회 API는 직렬화 시간이 DB 시간보다 긴 경우가 많아서 그동안 연결을 붙잡고 있지 않도록 함
+    """
+
+    async def exec(self, *args, **kwargs):
+        result = await super().exec(*args, **kwargs)
+        await self.commit()
+        return result
+
+    async def execute(self, *args, **kwargs):
+        result = await super().execute(*args, **kwargs)
+        await self.commit()
+        return result
+
+    async def get(self, *args, **kwargs):
+        result = await super().get(*args, **kwargs)
+        await self.commit()
+        return result
+
+
+# 조회 라우터에서 사용하는 세션, get_async_session과 마찬가지로 scope="function"으로 사용
+# 복제본이 설정되어 있으면 복제본에 연결됨
+# 조회 결과 캐시(cache.py)를 사용하는 세션이기 때문에 캐시에 결과가 있으면 연결을 빌리지 않고 바로 반환함
+# 단 최근에 쓰기를 한 클라이언트는 다른 워커의 캐시에 남은 이전 결과를 보지 않도록 캐시 없이 primary에서 읽음
+async def get_read_session(request : Request):
+    use_cache = not recent_write(request)
+    async with ReadSession(pick_read_engine(request), expire_on_commit=False, info={CACHE_SESSION_KEY : use_cache}) as session:
+        yield session
@@ -0,0 +1,66 @@
+"""
+server/main의 앱을 프로세스 안에서(httpx.ASGITransport) 실행하는 테스트
+실제 postgres가 필요함, 서버와 같은 환경변수(POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_DB, DB_NAME, DB_PORT)로 접속하고
+접속할 수 없으면 테스트를 건너뜀
+
+    cd server && python -m pytest -q tests
+"""
+import asyncio
+import os
+import sys
+import uuid
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "main")) # 서버 코드는 server/main을 기준으로 임포트함(from util import ...)
+
+import asyncpg
+
+import util
+from app import app
+
+
+def _db_available():
+    async def connect():
+        conn = await asyncpg.connect(util.ASYNC_POSTGRES_URL.replace("postgresql+asyncpg", "postgresql"), timeout=3)
+        await conn.close()
+    try:
+        asyncio.run(connect())
+        return True
+    except Exception:
+        return False
+
+
+@pytest.fixture(scope="session")
+def database():
+    if not _db_available():
+        pytest.skip("postgres에 접속할 수 없음")
+
+
+@pytest.fixture
+def run_app(database):
+    """
+    run_app(scenario) : 앱의 lifespan(스키마 확인, 사본/인덱스 로딩)을 실행한 뒤 scenario(client)를 실행하고 결과를 반환
+    테스트마다 새 이벤트 루프에서 실행하고, lifespan이 끝날 때 커넥션 풀을 정리하기 때문에 다음 테스트와 연결을 공유하지 않음
+    """
+    def run(scenario):
+        async def main():
+            try:
+                async with app.router.lifespan_context(app):
+                    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                        return await scenario(client)
+            finally:
+                # scenario가 실패하면 lifespan의 종료 코드(yield 아래)가 실행되지 않기 때문에
+                # 다음 테스트가 이 이벤트 루프에서 만든 연결을 받지 않도록 풀을 직접 정리함
+                await util.async_engine.dispose()
+                for replica in util.replica_engines:
+                    await replica.dispose()
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def unique():
+    """테스트 데이터 이름이 기존 데이터, 다른 테스트와 겹치지 않도록 붙이는 값"""
+    return uuid.uuid4().hex[:12]
@@ -0,0 +1,140 @@
+"""
+학생 이름 자동완성 인덱스(autocomplete.StudentNameIndex, user-018)
+db 없이 배열만 다루는 부분을 확인함, load는 결과를 흘려보내는 가짜 엔진으로 실행함
+"""
+import asyncio
+import unicodedata
+
+import pytest
+
+import autocomplete
+from autocomplete import StudentNameIndex, AUTOCOMPLETE_MERGE_THRESHOLD
+
+
+def build(pairs):
+    index = StudentNameIndex()
+    index.add_many(pairs)
+    return index
+
+
+def entries(index):
+    return [(name.decode(), student_id) for name, student_id in zip(index.names, index.ids)]
+
+
+def assert_sorted(index):
+    assert index.names == sorted(index.names)
+    assert len(index.names) == len(index.ids)
+
+
+class FakeEngine:
+    """engine.connect() -> conn.stream() -> result.partitions()만 흉내냄, 행을 보내는 중간에 during()을 실행함"""
+
+    def __init__(self, rows, during=None):
+        self.rows = rows
+        self.during = during
+
+    def connect(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def stream(self, statement):
+        return self
+
+    async def partitions(self):
+        half = len(self.rows) // 2
+        yield self.rows[:half]
+        if self.during is not None:
+            self.during()
+        yield self.rows[half:]
+
+
+@pytest.mark.parametrize("count", [AUTOCOMPLETE_MERGE_THRESHOLD - 1, AUTOCOMPLETE_MERGE_THRESHOLD, AUTOCOMPLETE_MERGE_THRESHOLD * 3])
+def test_add_many_merges_into_sorted_order(count):
+    # 짝수 번호는 미리 넣어두고 홀수 번호를 add_many로 넣어서 기존 이름 사이사이에 끼워지도록 함
+    index = build([(f"s{i:04d}", i) for i in range(0, count * 2, 2)])
+    index.add_many([(f"s{i:04d}", i) for i in range(count * 2 - 1, 0, -2)])
+
+    assert_sorted(index)
+    assert entries(index) == [(f"s{i:04d}", i) for i in range(count * 2)]
+
+
+@pytest.mark.parametrize("count", [1, AUTOCOMPLETE_MERGE_THRESHOLD * 2])
+def test_add_many_replaces_id_of_existing_name(count):
+    index = build([(f"s{i:04d}", i) for i in range(count)])
+    index.add_many([(f"s{i:04d}", 1000 + i) for i in range(count)] + [("zz-new", 7)])
+
+    assert_sorted(index)
+    assert entries(index) == [(f"s{i:04d}", 1000 + i) for i in range(count)] + [("zz-new", 7)]
+
+
+def test_add_replaces_id_of_existing_name():
+    index = build([("kim", 1), ("lee", 2)])
+    index.add("kim", 3)
+    assert entries(index) == [("kim", 3), ("lee", 2)]
+
+
+def test_rename_and_remove():
+    index = build([("kim", 1), ("lee", 2), ("park", 3)])
+
+    index.rename("lee", "choi", 2)
+    assert entries(index) == [("choi", 2), ("kim", 1), ("park", 3)]
+
+    index.rename("park", "park", 3) # 이름이 그대로면 아무것도 바꾸지 않음
+    index.remove("kim")
+    index.remove("nobody") # 없는 이름은 무시
+    assert entries(index) == [("choi", 2), ("park", 3)]
+
+
+def test_prefix_lookup_across_mutations():
+    index = build([("kim-a", 1), ("kim-c", 3), ("lee", 4)])
+    assert index.lookup("kim") == [(1, "kim-a"), (3, "kim-c")]
+
+    index.add("kim-b", 2)
+    index.remove("kim-a")
+    assert index.lookup("kim") == [(2, "kim-b"), (3, "kim-c")]
+    assert index.lookup("kim", limit=1) == [(2, "kim-b")]
+    assert index.lookup("park") == []
+
+
+def test_lookup_normalizes_prefix():
+    index = build([(unicodedata.normalize("NFD", "김철수"), 1)])
+    assert index.lookup(unicodedata.normalize("NFD", "김철")) == [(1, "김철수")]
+    assert index.lookup(" 김철 ") == [(1, "김철수")]
+
+
+def test_load_replays_changes_made_while_loading():
+    index = StudentNameIndex()
+
+    def during():
+        # 불러오는 도중 핸들러가 commit 직후 반영한 변경, 불러온 결과에는 빠져 있음
+        index.add("kim", 10)
+        index.remove("lee")
+        index.add_many([(f"bulk{i:03d}", 100 + i) for i in range(AUTOCOMPLETE_MERGE_THRESHOLD)])
+
+    asyncio.run(index.load(FakeEngine([(1, "choi"), (2, "lee"), (3, "park")], during)))
+
+    assert index.ready
+    assert_sorted(index)
+    assert index.lookup("kim") == [(10, "kim")]
+    assert index.lookup("lee") == []
+    assert len(index.lookup("bulk", limit=autocomplete.MAX_AUTOCOMPLETE)) == min(AUTOCOMPLETE_MERGE_THRESHOLD, autocomplete.MAX_AUTOCOMPLETE)
+    assert index._pending is None # 다 불러온 뒤에는 변경을 더 모으지 않음
+
+
+def test_load_sorts_names_that_change_order_after_nfc():
+    # db는 이름을 받은 그대로 COLLATE "C"로 정렬함, NFD로 분해된 한글(ᄀ, U+1100)은 NFC 한글(가, U+AC00)보다 앞에 옴
+    decomposed = unicodedata.normalize("NFD", "하늘")
+    rows = sorted([(1, decomposed), (2, "가람"), (3, "나래"), (4, "zeta")], key=lambda row : row[1].encode())
+    assert rows[1][1] == decomposed
+
+    index = StudentNameIndex()
+    asyncio.run(index.load(FakeEngine(rows)))
+
+    assert_sorted(index)
+    assert index.lookup("하") == [(1, "하늘")]
+    assert index.lookup("가") == [(2, "가람")]
@@ -0,0 +1,33 @@
+"""
+학생 명단 가져오기(importer.py, user-025)
+merge가 commit 된 뒤의 후속 작업(캐시 무효화, 자동완성 인덱스, ANALYZE)이 실패해도 가져오기는 done으로 기록되어야 함
+"""
+import orjson
+from sqlalchemy import text
+
+import importer
+import util
+
+
+def test_housekeeping_failure_keeps_import_done(run_app, unique, monkeypatch):
+    def broken_add_many(items):
+        raise RuntimeError("autocomplete is down")
+    monkeypatch.setattr(importer.student_names, "add_many", broken_add_many)
+
+    names = [f"import-{unique}-{i}" for i in range(3)]
+    body = b"\n".join(orjson.dumps({"name" : name, "age" : 20}) for name in names)
+
+    async def scenario(client):
+        try:
+            response = await client.post("/post/students/import?format=ndjson", content=body, headers={"Content-Type" : "application/x-ndjson"})
+            assert response.status_code == 200, response.text
+            result = response.json()
+            assert result["status"] == "done" and result["rows_inserted"] == len(names)
+
+            saved = await client.get(f"/get/student/import/{result['import_id']}")
+            assert saved.json()["status"] == "done"
+        finally:
+            async with util.async_engine.begin() as conn:
+                await conn.execute(text('DELETE FROM "Students" WHERE name = ANY(:names)'), {"names" : names})
+
+    run_app(scenario)
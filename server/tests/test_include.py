@@ -0,0 +1,94 @@
+"""
+include=(관계)로 관계 데이터를 함께 조회할 때 쿼리 수가 페이지 크기와 상관없이 일정한지 확인(user-010)
+관계를 행마다 따로 불러오면(N+1) 페이지 크기만큼 쿼리가 늘어남
+"""
+from sqlalchemy import event, text
+
+import cache
+import util
+
+
+PAGE_SIZES = (1, 10, 100)
+
+
+class StatementCounter:
+    """async_engine으로 db에 보낸 문장 수를 셈"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(util.async_engine.sync_engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(util.async_engine.sync_engine, "before_cursor_execute", self)
+
+
+async def count_statements(client, url):
+    with StatementCounter() as counter:
+        response = await client.get(url)
+    assert response.status_code == 200, response.text
+    return counter.count, response.json()
+
+
+async def seed(client, unique, colleges : int, students_per_college : int):
+    """단과대학과 소속 학생을 bulk api로 넣고 (college_ids, student_ids) 반환, 학생의 전공은 모두 include-{unique}"""
+    response = await client.post("/post/colleges/bulk", json=[{"college_name" : f"include-{unique}-{i}"} for i in range(colleges)])
+    college_ids = [item["id"] for item in response.json()["items"]]
+    response = await client.post("/post/students/bulk", json=[
+        {"name" : f"include-{unique}-{college_id}-{i}", "age" : 20, "major" : f"include-{unique}", "college_id" : college_id}
+        for college_id in college_ids for i in range(students_per_college)
+    ])
+    student_ids = [item["id"] for item in response.json()["items"]]
+    assert None not in college_ids and None not in student_ids
+    return college_ids, student_ids
+
+
+async def cleanup(college_ids, student_ids):
+    async with util.async_engine.begin() as conn:
+        await conn.execute(text('DELETE FROM "Students" WHERE student_id = ANY(:ids)'), {"ids" : student_ids})
+        await conn.execute(text('DELETE FROM "Colleges" WHERE college_id = ANY(:ids)'), {"ids" : college_ids})
+
+
+def test_student_include_college_query_count_is_constant(run_app, unique, monkeypatch):
+    monkeypatch.setattr(cache, "query_cache", None) # 캐시에서 꺼내면 쿼리 수가 0이 되기 때문에 끔
+
+    async def scenario(client):
+        # 학생마다 단과대학이 달라야 관계를 행마다 불러오는 경우 쿼리 수가 늘어남
+        college_ids, student_ids = await seed(client, unique, colleges=max(PAGE_SIZES), students_per_college=1)
+        try:
+            counts = {}
+            for size in PAGE_SIZES:
+                counts[size], items = await count_statements(client, f"/get/student?major=include-{unique}&include=college&limit={size}")
+                assert len(items) == size
+                assert all(item["college"]["college_id"] == item["college_id"] for item in items)
+            return counts
+        finally:
+            await cleanup(college_ids, student_ids)
+
+    counts = run_app(scenario)
+    assert len(set(counts.values())) == 1, counts
+
+
+def test_college_include_students_query_count_is_constant(run_app, unique, monkeypatch):
+    monkeypatch.setattr(cache, "query_cache", None)
+
+    async def scenario(client):
+        college_ids, student_ids = await seed(client, unique, colleges=max(PAGE_SIZES), students_per_college=2)
+        try:
+            counts = {}
+            for size in PAGE_SIZES:
+                ids = ",".join(map(str, college_ids[:size]))
+                counts[size], body = await count_statements(client, f"/get/college?ids={ids}&include=students")
+                assert len(body["items"]) == size
+                assert all(len(item["students"]) == 2 for item in body["items"])
+            return counts
+        finally:
+            await cleanup(college_ids, student_ids)
+
+    counts = run_app(scenario)
+    assert len(set(counts.values())) == 1, counts
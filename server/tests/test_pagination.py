@@ -0,0 +1,133 @@
+"""
+커서(keyset) 페이지네이션(pagination.py, user-007)
+커서 인코딩은 db 없이 확인하고, 정렬 값이 겹치는(age가 같은) 학생들을 페이지로 나눠 읽었을 때 빠지거나 겹치는 행이 없는지는 db로 확인함
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import text
+
+import queries
+import util
+from pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, set_next_cursor
+
+
+# 커서 --------------------------------------------------------------------------------------------------------------------------------------------------------
+
+def test_cursor_round_trip_keeps_int_sort_value():
+    cursor = encode_cursor("-age", 21, 1234)
+    assert "=" not in cursor # 쿼리 문자열에 그대로 넣을 수 있도록 padding을 뗌
+    assert decode_cursor(cursor, "-age") == (21, 1234)
+
+
+def test_cursor_round_trip_keeps_added_at():
+    added_at = datetime(2026, 3, 2, 9, 30, 15, 123456)
+    sort_value, pk = decode_cursor(encode_cursor("added_at", added_at, 7), "added_at")
+    assert pk == 7
+    assert queries.parse_student_sort_value("added_at", sort_value) == added_at
+
+
+def test_cursor_from_other_sort_is_rejected():
+    cursor = encode_cursor("age", 21, 1234)
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, "-age")
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", encode_cursor("age", 21, "1234")])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, "age")
+    assert error.value.status_code == 400
+
+
+def test_next_cursor_only_when_page_is_full():
+    rows = [SimpleNamespace(age=20, student_id=1), SimpleNamespace(age=21, student_id=2)]
+
+    response = Response()
+    set_next_cursor(response, rows, 3, "age", "age", "student_id")
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+    response = Response()
+    set_next_cursor(response, rows, 2, "age", "age", "student_id")
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER], "age") == (21, 2)
+
+
+
+# 페이지 넘기기 --------------------------------------------------------------------------------------------------------------------------------------------------
+
+STUDENTS = 25
+PAGE_SIZE = 4
+
+
+async def seed(client, unique):
+    """age가 세 값(20, 21, 22)만 가지도록 넣어서 정렬 값이 겹치는 학생을 만듦, 전공은 모두 page-{unique}"""
+    response = await client.post("/post/students/bulk", json=[
+        {"name" : f"page-{unique}-{i}", "age" : 20 + i % 3, "major" : f"page-{unique}"} for i in range(STUDENTS)
+    ])
+    student_ids = [item["id"] for item in response.json()["items"]]
+    assert None not in student_ids
+    return student_ids
+
+
+async def walk(client, url):
+    """X-Next-Cursor를 따라가면서 모든 페이지를 읽고 (행 목록, 페이지 수)를 반환"""
+    items, pages = [], 0
+    cursor = None
+    while True:
+        response = await client.get(f"{url}&cursor={cursor}" if cursor else url) # httpx의 params는 url의 쿼리 문자열을 덮어씀
+        if response.status_code == 404: # 마지막 페이지가 꽉 찼다면 다음 페이지는 비어 있음
+            break
+        assert response.status_code == 200, response.text
+        pages += 1
+        items.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+        assert pages <= STUDENTS, "커서가 앞으로 나아가지 않음"
+    return items, pages
+
+
+@pytest.mark.parametrize("sort", ["age", "-age", "added_at", "-added_at"])
+def test_cursor_walk_has_no_duplicates_or_gaps(run_app, unique, sort):
+    key = sort.lstrip("-")
+    descending = sort.startswith("-")
+
+    async def scenario(client):
+        student_ids = await seed(client, unique)
+        try:
+            items, pages = await walk(client, f"/get/student?major=page-{unique}&sort={sort}&limit={PAGE_SIZE}")
+
+            ids = [item["student_id"] for item in items]
+            assert len(ids) == len(set(ids)) # 겹치는 행 없음
+            assert set(ids) == set(student_ids) # 빠진 행 없음
+            assert pages == -(-STUDENTS // PAGE_SIZE)
+
+            # 같은 정렬 값 안에서는 student_id로 순서가 정해짐
+            value = (lambda item : datetime.fromisoformat(item[key])) if key == "added_at" else (lambda item : item[key])
+            order = [(value(item), item["student_id"]) for item in items]
+            assert order == sorted(order, reverse=descending)
+        finally:
+            async with util.async_engine.begin() as conn:
+                await conn.execute(text('DELETE FROM "Students" WHERE student_id = ANY(:ids)'), {"ids" : student_ids})
+
+    run_app(scenario)
+
+
+def test_cursor_reused_with_other_sort_returns_400(run_app, unique):
+    async def scenario(client):
+        student_ids = await seed(client, unique)
+        try:
+            response = await client.get(f"/get/student?major=page-{unique}&sort=-age&limit={PAGE_SIZE}")
+            cursor = response.headers[NEXT_CURSOR_HEADER]
+
+            assert (await client.get(f"/get/student?major=page-{unique}&sort=-age&limit={PAGE_SIZE}&cursor={cursor}")).status_code == 200
+            response = await client.get(f"/get/student?major=page-{unique}&sort=age&limit={PAGE_SIZE}&cursor={cursor}")
+            assert response.status_code == 400
+        finally:
+            async with util.async_engine.begin() as conn:
+                await conn.execute(text('DELETE FROM "Students" WHERE student_id = ANY(:ids)'), {"ids" : student_ids})
+
+    run_app(scenario)
@@ -0,0 +1,63 @@
+"""
+조회 결과 캐시(cache.py)와 read-your-writes(user-012)
+다른 워커에서 쓴 내용은 이 워커의 캐시가 무효화하지 못하기 때문에 TTL 동안 이전 결과가 보이지만
+쓰기를 한 클라이언트(last_write_at 쿠키)는 캐시를 거치지 않고 바로 새 값을 봐야 함
+"""
+import time
+
+import pytest
+
+from sqlalchemy import text
+
+import cache
+import util
+
+
+async def seed_student(client, unique):
+    response = await client.post("/post/students/bulk", json=[{"name" : f"cache-{unique}", "age" : 20}])
+    student_id = response.json()["items"][0]["id"]
+    assert student_id is not None
+    client.cookies.clear() # bulk 응답이 남긴 last_write_at 쿠키를 지워서 캐시를 사용하는 클라이언트로 만듦
+    return student_id
+
+
+async def write_from_other_worker(student_id, age):
+    """세션을 거치지 않고 db를 직접 바꿔서 이 워커의 캐시가 무효화되지 않는 다른 워커의 쓰기를 흉내냄"""
+    async with util.async_engine.begin() as conn:
+        await conn.execute(text('UPDATE "Students" SET age = :age, version = version + 1 WHERE student_id = :id'), {"age" : age, "id" : student_id})
+
+
+def test_recent_writer_skips_cache_for_cross_worker_write(run_app, unique):
+    async def scenario(client):
+        student_id = await seed_student(client, unique)
+        url = f"/get/student/{student_id}"
+        try:
+            first = await client.get(url)
+            assert first.status_code == 200 and first.json()["age"] == 20
+
+            await write_from_other_worker(student_id, 21)
+
+            # 쿠키가 없는 클라이언트는 TTL 동안 캐시에 남은 이전 결과를 봄
+            stale = await client.get(url)
+            assert stale.json()["age"] == 20
+
+            # 방금 쓰기를 한 클라이언트는 캐시 없이 primary에서 읽음
+            fresh = await client.get(url, headers={"Cookie" : f"{util.LAST_WRITE_COOKIE}={time.time()}"})
+            assert fresh.status_code == 200
+            assert fresh.json()["age"] == 21
+            assert fresh.json()["version"] == first.json()["version"] + 1
+        finally:
+            async with util.async_engine.begin() as conn:
+                await conn.execute(text('DELETE FROM "Students" WHERE student_id = :id'), {"id" : student_id})
+
+    run_app(scenario)
+
+
+def test_cache_backend_requires_every_method():
+    class PartialCache(cache.CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialCache()
+    cache.MemoryCache(max_entries=1, ttl=1) # 모든 메서드를 구현한 저장소는 그대로 만들 수 있음
@@ -0,0 +1,100 @@
+"""
+조회 요청을 읽기 전용 복제본으로 보내고, 방금 쓰기를 한 클라이언트는 primary에서 읽는지 확인(user-004)
+로컬 postgres에 복제본 대신 쓸 두 번째 db(<POSTGRES_DB>_test_replica)를 만들고 DB_READ_REPLICA_URLS로 설정한 것처럼 엔진을 바꿔 끼움
+실제 복제는 하지 않기 때문에 같은 student_id의 이름을 두 db에 다르게 넣어두고 응답의 이름으로 어느 db에서 읽었는지 구분함
+"""
+import asyncio
+import itertools
+import time
+
+import asyncpg
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import cache
+import util
+from schema import bootstrap_schema
+
+
+REPLICA_DB = f"{util.POSTGRES_DB}_test_replica"
+
+
+@pytest.fixture(scope="session")
+def replica_url(database):
+    """테스트용 복제본 db를 새로 만들고 primary와 같은 방법(bootstrap_schema)으로 스키마를 만든 뒤 주소를 반환, db를 만들 권한이 없으면 건너뜀"""
+    url = f"{util.ASYNC_POSTGRES_URL.rsplit('/', 1)[0]}/{REPLICA_DB}"
+
+    async def prepare():
+        conn = await asyncpg.connect(util.ASYNC_POSTGRES_URL.replace("postgresql+asyncpg", "postgresql"))
+        try:
+            await conn.execute(f'DROP DATABASE IF EXISTS "{REPLICA_DB}"')
+            await conn.execute(f'CREATE DATABASE "{REPLICA_DB}"')
+        finally:
+            await conn.close()
+
+        engine = create_async_engine(url)
+        try:
+            await bootstrap_schema(engine)
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(prepare())
+    except asyncpg.InsufficientPrivilegeError:
+        pytest.skip(f"{REPLICA_DB} db를 만들 권한이 없음")
+    except ProgrammingError as e: # 확장(pg_trgm)의 연산자 클래스가 없는 postgres 등
+        pytest.skip(f"{REPLICA_DB}에 스키마를 만들 수 없음: {e.orig}")
+    return url
+
+
+@pytest.fixture
+def replica(replica_url, monkeypatch):
+    """DB_READ_REPLICA_URLS=replica_url로 실행한 것처럼 util의 복제본 엔진을 바꿈, 엔진은 lifespan이 끝날 때 정리됨"""
+    monkeypatch.setenv("DB_READ_REPLICA_URLS", replica_url)
+    engine = util.create_pooled_async_engine(replica_url)
+    monkeypatch.setattr(util, "replica_engines", [engine])
+    monkeypatch.setattr(util, "_replica_cycle", itertools.cycle([engine]))
+    monkeypatch.setattr(cache, "query_cache", None) # 어느 db에서 읽었는지 매번 확인해야 하기 때문에 캐시를 끔
+    return engine
+
+
+def cookie(written_at : float):
+    return {"Cookie" : f"{util.LAST_WRITE_COOKIE}={written_at}"}
+
+
+def test_reads_go_to_replica_unless_client_wrote_recently(run_app, replica, unique):
+    async def scenario(client):
+        response = await client.post("/post/students/bulk", json=[{"name" : f"primary-{unique}", "age" : 20}])
+        student_id = response.json()["items"][0]["id"]
+        assert student_id is not None
+        async with replica.begin() as conn:
+            await conn.execute(
+                text('INSERT INTO "Students" (student_id, name, age, added_at, version) VALUES (:id, :name, 20, now(), 1)'),
+                {"id" : student_id, "name" : f"replica-{unique}"}
+            )
+
+        url = f"/get/student/{student_id}"
+        read_from = lambda response : response.json()["name"].split("-")[0]
+        try:
+            # 쓰기 응답이 남긴 쿠키를 그대로 가진 클라이언트는 primary에서 읽음
+            assert util.LAST_WRITE_COOKIE in client.cookies
+            assert read_from(await client.get(url)) == "primary"
+
+            client.cookies.clear()
+            assert read_from(await client.get(url)) == "replica"
+
+            now = time.time()
+            window = util.READ_YOUR_WRITES_WINDOW
+            assert window >= util.DB_READ_YOUR_WRITES_WINDOW
+            assert read_from(await client.get(url, headers=cookie(now - window + 1))) == "primary" # 아직 창 안
+            assert read_from(await client.get(url, headers=cookie(now - window - 1))) == "replica" # 창이 지남
+            assert read_from(await client.get(url, headers=cookie("not-a-time"))) == "replica" # 잘못된 쿠키는 무시
+        finally:
+            async with util.async_engine.begin() as conn:
+                await conn.execute(text('DELETE FROM "Students" WHERE student_id = :id'), {"id" : student_id})
+            async with replica.begin() as conn:
+                await conn.execute(text('DELETE FROM "Students" WHERE student_id = :id'), {"id" : student_id})
+
+    run_app(scenario)
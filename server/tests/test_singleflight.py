@@ -0,0 +1,158 @@
+"""
+같은 조회 요청 합치기(singleflight.py, user-022)
+db 없이 가짜 ASGI 앱으로 키 정규화와 leader/follower 동작을 확인함
+"""
+import asyncio
+
+import pytest
+
+import singleflight
+from singleflight import SingleFlight, SingleFlightMiddleware, flight_key
+from util import LAST_WRITE_COOKIE
+
+
+def make_scope(path="/get/student", query="", method="GET", headers=(), root_path=""):
+    return {
+        "type" : "http",
+        "method" : method,
+        "path" : root_path + path,
+        "root_path" : root_path,
+        "query_string" : query.encode(),
+        "headers" : [(name.encode(), value.encode()) for name, value in headers]
+    }
+
+
+class StubApp:
+    """요청 수를 세고 gate가 열릴 때까지 응답을 미루는 앱, mode로 스트리밍, 오류를 흉내냄"""
+
+    def __init__(self, mode="buffered"):
+        self.mode = mode
+        self.calls = 0
+        self.gate = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        call = self.calls
+        await self.gate.wait()
+        if self.mode == "error" and call == 1:
+            raise RuntimeError("leader failed")
+        await send({"type" : "http.response.start", "status" : 200, "headers" : [(b"content-type", b"text/plain")]})
+        if self.mode == "stream" and call == 1:
+            await send({"type" : "http.response.body", "body" : b"part-", "more_body" : True})
+        await send({"type" : "http.response.body", "body" : f"call-{call}".encode()})
+
+
+async def request(app, scope):
+    messages = []
+
+    async def receive():
+        return {"type" : "http.request", "body" : b"", "more_body" : False}
+
+    async def send(message):
+        messages.append(message)
+
+    try:
+        await app(scope, receive, send)
+    except RuntimeError:
+        return None
+    return b"".join(message.get("body", b"") for message in messages if message["type"] == "http.response.body")
+
+
+async def burst(stub, count, scope=None):
+    """같은 요청 count개를 동시에 보내고 모두 기다리는 상태가 된 뒤에 gate를 엶"""
+    app = SingleFlightMiddleware(stub)
+    tasks = [asyncio.create_task(request(app, scope or make_scope())) for _ in range(count)]
+    await asyncio.sleep(0)
+    stub.gate.set()
+    return await asyncio.gather(*tasks)
+
+
+@pytest.fixture
+def group(monkeypatch):
+    monkeypatch.setattr(singleflight, "SINGLE_FLIGHT", True)
+    group = SingleFlight()
+    monkeypatch.setattr(singleflight, "single_flight", group)
+    return group
+
+
+# 키 ----------------------------------------------------------------------------------------------------------------------------------------------------------
+
+def test_flight_key_ignores_query_order():
+    assert flight_key(make_scope(query="limit=10&sort=age")) == flight_key(make_scope(query="sort=age&limit=10"))
+    assert flight_key(make_scope(query="sort=age&limit=10")) != flight_key(make_scope(query="sort=age&limit=20"))
+
+
+def test_flight_key_includes_if_none_match():
+    plain = flight_key(make_scope())
+    conditional = flight_key(make_scope(headers=[("If-None-Match", '"abc"')]))
+    assert plain != conditional
+    assert conditional == flight_key(make_scope(headers=[("if-none-match", '"abc"')]))
+
+
+def test_flight_key_skips_recent_writers():
+    assert flight_key(make_scope(headers=[("cookie", f"theme=dark; {LAST_WRITE_COOKIE}=1700000000.0")])) is None
+    assert flight_key(make_scope(headers=[("cookie", "theme=dark")])) is not None
+
+
+def test_flight_key_only_for_get_prefixes():
+    assert flight_key(make_scope(method="POST")) is None
+    assert flight_key(make_scope(path="/post/student")) is None
+    assert flight_key({"type" : "websocket", "path" : "/get/student"}) is None
+    # nginx 뒤에서 root_path(/main_server)가 붙어 있어도 같은 키
+    assert flight_key(make_scope(root_path="/main_server")) == flight_key(make_scope())
+
+
+# leader / follower ----------------------------------------------------------------------------------------------------------------------------------------------
+
+def test_concurrent_requests_share_one_execution(group):
+    stub = StubApp()
+    bodies = asyncio.run(burst(stub, 5))
+
+    assert stub.calls == 1
+    assert bodies == [b"call-1"] * 5
+    assert (group.leaders, group.followers, group.fallbacks) == (1, 4, 0)
+    assert group.flights == {} # 끝난 요청은 목록에서 빠짐
+
+
+def test_different_keys_are_not_merged(group):
+    stub = StubApp()
+
+    async def scenario():
+        app = SingleFlightMiddleware(stub)
+        tasks = [asyncio.create_task(request(app, make_scope(query=f"offset={i}"))) for i in range(3)]
+        await asyncio.sleep(0)
+        stub.gate.set()
+        return await asyncio.gather(*tasks)
+
+    assert sorted(asyncio.run(scenario())) == [b"call-1", b"call-2", b"call-3"]
+    assert stub.calls == 3
+
+
+def test_followers_fall_back_when_leader_streams(group):
+    stub = StubApp(mode="stream")
+    bodies = asyncio.run(burst(stub, 3))
+
+    assert stub.calls == 3
+    assert bodies[0] == b"part-call-1"
+    assert sorted(bodies[1:]) == [b"call-2", b"call-3"]
+    assert (group.leaders, group.followers, group.fallbacks) == (1, 0, 2)
+
+
+def test_followers_fall_back_when_leader_fails(group):
+    stub = StubApp(mode="error")
+    bodies = asyncio.run(burst(stub, 3))
+
+    assert stub.calls == 3
+    assert bodies[0] is None
+    assert sorted(bodies[1:]) == [b"call-2", b"call-3"]
+    assert (group.leaders, group.followers, group.fallbacks) == (1, 0, 2)
+    assert group.flights == {}
+
+
+def test_disabled_passes_every_request_through(group, monkeypatch):
+    monkeypatch.setattr(singleflight, "SINGLE_FLIGHT", False)
+    stub = StubApp()
+    bodies = asyncio.run(burst(stub, 3))
+
+    assert stub.calls == 3
+    assert group.leaders == 0